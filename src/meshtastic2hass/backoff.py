@@ -0,0 +1,49 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import random
+
+
+class Backoff:
+    """Exponential reconnect delay with jitter.
+
+    The delay grows by factor from minDelay up to maxDelay with every failed
+    attempt. Jitter shortens each delay by a random fraction of up to jitter,
+    so several bridges do not hammer a recovering broker at the same time.
+    """
+
+    def __init__(
+        self, minDelay=1, maxDelay=120, factor=2, jitter=0.5, rng=random.random
+    ):
+        """Constructor for the Backoff class"""
+        self.minDelay = float(minDelay)
+        self.maxDelay = float(maxDelay)
+        self.factor = float(factor)
+        self.jitter = min(max(float(jitter), 0.0), 1.0)
+        self.rng = rng
+        self.attempts = 0
+
+    def next(self):
+        """Get the delay before the next attempt"""
+        delay = self.minDelay * self.factor ** min(self.attempts, 64)
+        delay = min(delay, self.maxDelay)
+        self.attempts += 1
+        return delay * (1 - self.jitter * self.rng())
+
+    def reset(self):
+        """Start over with the minimum delay after a successful attempt"""
+        self.attempts = 0
@@ -0,0 +1,337 @@
+#!python3
+
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+"""Synthetic scale benchmark of the packet handlers.
+
+Run with python -m meshtastic2hass.benchmark --output results.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+from . import capture, serializer
+from .globals import Globals
+from .meshtastic2hass import (
+    __version__,
+    initPublisher,
+    onMQTTMessage,
+    onMQTTPublish,
+    onReceive,
+    sendQueued,
+)
+from .radio import RadioContext
+from .scheduler import OutboundScheduler
+
+CHANNELS = ["LongFast", "Private"]
+
+
+def makeNodes(count):
+    """Create a node DB with count nodes"""
+    nodes = {}
+    for i in range(count):
+        fromId = f"!{0x10000000 + i:08x}"
+        nodes[fromId] = {
+            "num": 0x10000000 + i,
+            "user": {
+                "id": fromId,
+                "shortName": f"{i % 0xFFFF:04x}",
+                "longName": f"Node {i}",
+                "hwModel": "TBEAM",
+            },
+        }
+    return nodes
+
+
+def makeTelemetry(fromId, packetId, rng):
+    """Create a telemetry packet with device, environment or power metrics"""
+    kind = packetId % 3
+    if kind == 0:
+        telemetry = {
+            "deviceMetrics": {
+                "batteryLevel": rng.randint(0, 100),
+                "voltage": round(rng.uniform(3.3, 4.2), 3),
+                "channelUtilization": round(rng.uniform(0, 30), 2),
+                "airUtilTx": round(rng.uniform(0, 5), 2),
+                "uptimeSeconds": rng.randint(0, 10**6),
+            }
+        }
+    elif kind == 1:
+        telemetry = {
+            "environmentMetrics": {
+                "temperature": round(rng.uniform(-10, 35), 2),
+                "relativeHumidity": round(rng.uniform(10, 90), 2),
+                "barometricPressure": round(rng.uniform(980, 1030), 2),
+            }
+        }
+    else:
+        telemetry = {
+            "powerMetrics": {
+                "ch1Voltage": round(rng.uniform(11, 14), 3),
+                "ch1Current": round(rng.uniform(0, 500), 1),
+            }
+        }
+    return {
+        "from": int(fromId[1:], 16),
+        "fromId": fromId,
+        "id": packetId,
+        "rxRssi": rng.randint(-120, -40),
+        "rxSnr": round(rng.uniform(-20, 10), 2),
+        "hopStart": 3,
+        "hopLimit": rng.randint(0, 3),
+        "decoded": {"portnum": "TELEMETRY_APP", "telemetry": telemetry},
+    }
+
+
+def makePosition(fromId, packetId, rng):
+    """Create a position packet"""
+    return {
+        "from": int(fromId[1:], 16),
+        "fromId": fromId,
+        "id": packetId,
+        "decoded": {
+            "portnum": "POSITION_APP",
+            "position": {
+                "latitude": round(rng.uniform(47, 49), 6),
+                "longitude": round(rng.uniform(10, 12), 6),
+                "satsInView": rng.randint(0, 12),
+            },
+        },
+    }
+
+
+def makeText(fromId, packetId, rng):
+    """Create a text packet"""
+    return {
+        "from": int(fromId[1:], 16),
+        "fromId": fromId,
+        "id": packetId,
+        "channel": packetId % len(CHANNELS),
+        "decoded": {"portnum": "TEXT_MESSAGE_APP", "text": f"Message {packetId}"},
+    }
+
+
+def makeMQTTMessage(packetId, rng):
+    """Create an MQTT message to be forwarded to a channel"""
+    channel = CHANNELS[packetId % len(CHANNELS)]
+    return types.SimpleNamespace(
+        topic=f"{Globals.getInstance().getTopicPrefix()}/{channel}",
+        payload=f"Automation {packetId}".encode("utf-8"),
+    )
+
+
+def setupGlobals(nodes, packets=1000):
+    """Reset the global state and use a fake interface and MQTT client"""
+    _globals = Globals.getInstance()
+    _globals.reset()
+    _globals.setArgs(
+        types.SimpleNamespace(
+            mqtt_queue_size=1000,
+            mqtt_max_inflight=20,
+            mqtt_queue_overflow="drop_oldest",
+            mqtt_blocking_publish=False,
+        )
+    )
+    # Enabled primary and secondary channel
+    channels = [types.SimpleNamespace(role=1), types.SimpleNamespace(role=2)]
+    interface = capture.FakeInterface(nodes, channels)
+    radio = RadioContext("benchmark")
+    radio.interface = interface
+    radio.channelList.extend(CHANNELS)
+    _globals.addRadio(radio)
+    # Unlimited airtime, every queued text message is sent right away
+    _globals.setScheduler(
+        OutboundScheduler(queueSize=packets, airtimeShare=1e9, burst=1e9)
+    )
+    mqtt = capture.FakeMQTTClient()
+    mqtt.on_publish = onMQTTPublish
+    _globals.setMQTT(mqtt)
+    initPublisher(mqtt).setConnected(True)
+    return interface, mqtt
+
+
+def makeWorkload(scenario, nodes, packets, seed):
+    """Create the call arguments of a scenario"""
+    rng = random.Random(seed)
+    ids = list(nodes)
+    workload = []
+    for i in range(packets):
+        fromId = ids[i % len(ids)]
+        packetId = i + 1
+        if scenario == "telemetry":
+            workload.append(makeTelemetry(fromId, packetId, rng))
+        elif scenario == "position":
+            workload.append(makePosition(fromId, packetId, rng))
+        elif scenario == "text":
+            workload.append(makeText(fromId, packetId, rng))
+        elif scenario == "mqtt_message":
+            workload.append(makeMQTTMessage(packetId, rng))
+    return workload
+
+
+def runWorkload(scenario, workload, interface, mqtt, latencies=None):
+    """Feed a workload through the handler of a scenario"""
+    perfCounter = time.perf_counter
+    if scenario == "mqtt_message":
+        for msg in workload:
+            t0 = perfCounter()
+            onMQTTMessage(mqtt, None, msg)
+            sendQueued()
+            if latencies is not None:
+                latencies.append(perfCounter() - t0)
+        return
+    # All packets take the full path through the portnum dispatch
+    for packet in workload:
+        t0 = perfCounter()
+        onReceive(packet, interface)
+        if latencies is not None:
+            latencies.append(perfCounter() - t0)
+
+
+def runScenario(scenario, nodeCount, packets, seed=1):
+    """Run a scenario and return its results"""
+    nodes = makeNodes(nodeCount)
+    workload = makeWorkload(scenario, nodes, packets, seed)
+    # Timing pass
+    interface, mqtt = setupGlobals(nodes, packets)
+    latencies = []
+    start = time.perf_counter()
+    runWorkload(scenario, workload, interface, mqtt, latencies)
+    elapsed = time.perf_counter() - start
+    published = mqtt.count
+    publishedBytes = mqtt.bytes
+    latencies.sort()
+    # Memory pass, tracing slows down the handlers so it is not timed
+    interface, mqtt = setupGlobals(nodes, packets)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    runWorkload(scenario, workload, interface, mqtt)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    return {
+        "scenario": scenario,
+        "nodes": nodeCount,
+        "packets": packets,
+        "elapsed": elapsed,
+        "throughput": packets / elapsed if elapsed > 0 else 0.0,
+        "p50": capture.percentile(latencies, 0.50),
+        "p99": capture.percentile(latencies, 0.99),
+        "max": latencies[-1] if latencies else 0.0,
+        "published": published,
+        "publishedBytes": publishedBytes,
+        "allocatedBlocks": sum(stat.count_diff for stat in stats),
+        "allocatedBytes": sum(stat.size_diff for stat in stats),
+        "peakMemory": peak,
+    }
+
+
+def compareResults(results, baseline):
+    """Print the relative change against baseline results"""
+    old = {(r["scenario"], r["nodes"]): r for r in baseline.get("results", [])}
+    print(f"Compared with version {baseline.get('version')}:")
+    for result in results:
+        previous = old.get((result["scenario"], result["nodes"]))
+        if previous is None:
+            continue
+        throughput = (
+            result["throughput"] / previous["throughput"] - 1
+            if previous["throughput"]
+            else 0
+        )
+        p99 = result["p99"] / previous["p99"] - 1 if previous["p99"] else 0
+        print(
+            f"  {result['scenario']:>12} {result['nodes']:>6} nodes: "
+            f"throughput {throughput:+.1%}, p99 {p99:+.1%}"
+        )
+
+
+def main():
+    """Benchmark main function"""
+    parser = argparse.ArgumentParser(
+        prog="meshtastic2hass.benchmark",
+        description="Synthetic scale benchmark of the meshtastic2hass packet handlers.",
+    )
+    parser.add_argument(
+        "--nodes",
+        help="Comma separated node counts.",
+        default="10,100,1000,10000",
+        required=False,
+    )
+    parser.add_argument(
+        "--packets",
+        help="Number of packets per scenario.",
+        default=20000,
+        required=False,
+    )
+    parser.add_argument(
+        "--scenarios",
+        help="Comma separated scenarios.",
+        default="telemetry,position,text,mqtt_message",
+        required=False,
+    )
+    parser.add_argument(
+        "--output",
+        help="Path of the JSON results file.",
+        default="benchmark-results.json",
+        required=False,
+    )
+    parser.add_argument(
+        "--compare",
+        help="Path of a JSON results file of a previous run to compare with.",
+        default=None,
+        required=False,
+    )
+    args = parser.parse_args()
+
+    results = []
+    for scenario in args.scenarios.split(","):
+        for nodeCount in [int(n) for n in args.nodes.split(",")]:
+            result = runScenario(scenario, nodeCount, int(args.packets))
+            results.append(result)
+            print(
+                f"{scenario:>12} {nodeCount:>6} nodes: "
+                f"{result['throughput']:>9.0f} packets/s, "
+                f"p50 {result['p50'] * 1e6:.1f} us, p99 {result['p99'] * 1e6:.1f} us, "
+                f"peak {result['peakMemory'] / 1024:.0f} KiB"
+            )
+    output = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "encoder": serializer.getEncoderName(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(output, file, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compareResults(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import threading
+import time
+from collections import OrderedDict
+
+from .serializer import dumps
+
+
+class NodeEntry:
+    """Precomputed topics and discovery payloads of a node, and its state.
+
+    The state is the last seen time, the availability and the last published
+    telemetry values and position.
+    """
+
+    __slots__ = (
+        "fromId",
+        "shortName",
+        "nodeId",
+        "stateTopics",
+        "attributesTopic",
+        "trackerConfigTopic",
+        "trackerConfig",
+        "sensorConfigs",
+        "deviceConfigTopic",
+        "sensorComponents",
+        "trackerComponent",
+        "components",
+        "availabilityTopic",
+        "lastSeen",
+        "online",
+        "states",
+        "position",
+    )
+
+    def __init__(
+        self,
+        fromId,
+        shortName,
+        nodeId,
+        topicPrefix,
+        sensorsByTopic,
+        deviceDiscovery=False,
+        availability=False,
+    ):
+        """Constructor for the NodeEntry class"""
+        self.fromId = fromId
+        self.shortName = shortName
+        # Node id without special characters
+        self.nodeId = nodeId
+        # Availability topic referenced by the discovery configs, None without
+        self.availabilityTopic = (
+            f"{topicPrefix}/{nodeId}/availability" if availability else None
+        )
+        self.lastSeen = 0.0
+        self.online = False
+        # State topic suffix -> last published telemetry values, see Deadband
+        self.states = None
+        # Last published position, see PositionFilter
+        self.position = None
+        # Telemetry state topic per state topic suffix, i.e. device
+        self.stateTopics = {}
+        # State topic suffix -> list of (property, config topic, encoded config payload)
+        self.sensorConfigs = {}
+        # With device discovery all components of a node share one config topic,
+        # state topic suffix -> list of (property, component id, component config)
+        self.deviceConfigTopic = (
+            f"homeassistant/device/{nodeId}/config" if deviceDiscovery else None
+        )
+        self.sensorComponents = {}
+        # Component id -> config of the announced components, in announce order
+        self.components = None
+        uniqueIdPrefix = shortName.lower()
+        for suffix, sensors in sensorsByTopic.items():
+            stateTopic = f"{topicPrefix}/{nodeId}/{suffix}"
+            self.stateTopics[suffix] = stateTopic
+            configs = self.sensorConfigs[suffix] = []
+            components = self.sensorComponents[suffix] = []
+            for sensor in sensors:
+                jsonObj = {}
+                if deviceDiscovery:
+                    # Home Assistant prefixes the entity name with the device name
+                    jsonObj["platform"] = "sensor"
+                    jsonObj["name"] = sensor.name
+                else:
+                    jsonObj["name"] = f"{shortName} {sensor.name}"
+                jsonObj["unique_id"] = uniqueIdPrefix + sensor.uniqueIdSuffix
+                jsonObj["state_topic"] = stateTopic
+                if availability and not deviceDiscovery:
+                    jsonObj["availability_topic"] = self.availabilityTopic
+                if sensor.stateClass:
+                    jsonObj["state_class"] = sensor.stateClass
+                if not deviceDiscovery:
+                    jsonObj["platform"] = "mqtt"
+                if sensor.deviceClass:
+                    jsonObj["device_class"] = sensor.deviceClass
+                if sensor.unit:
+                    jsonObj["unit_of_measurement"] = sensor.unit
+                if sensor.icon:
+                    jsonObj["icon"] = sensor.icon
+                jsonObj["value_template"] = sensor.valueTemplate
+                if deviceDiscovery:
+                    components.append((sensor.property, sensor.id, jsonObj))
+                    continue
+                configs.append(
+                    (
+                        sensor.property,
+                        f"homeassistant/sensor/{nodeId}/{sensor.id}/config",
+                        dumps(jsonObj),
+                    )
+                )
+        # Device tracker
+        self.attributesTopic = f"{topicPrefix}/{nodeId}/attributes"
+        self.trackerConfigTopic = f"homeassistant/device_tracker/{nodeId}/config"
+        jsonObj = {}
+        if deviceDiscovery:
+            jsonObj["platform"] = "device_tracker"
+            jsonObj["name"] = "Position"
+        else:
+            jsonObj["name"] = f"{shortName} Position"
+        jsonObj["unique_id"] = f"{shortName.lower()}_position"
+        jsonObj["json_attributes_topic"] = self.attributesTopic
+        jsonObj["source_type"] = "gps"
+        if availability and not deviceDiscovery:
+            jsonObj["availability_topic"] = self.availabilityTopic
+        if deviceDiscovery:
+            self.trackerComponent = ("position", jsonObj)
+            self.trackerConfig = None
+        else:
+            self.trackerComponent = None
+            self.trackerConfig = dumps(jsonObj)
+
+    def getComponents(self):
+        """Get all components of the device discovery config as dictionary"""
+        components = {
+            componentId: component
+            for entries in self.sensorComponents.values()
+            for _, componentId, component in entries
+        }
+        components[self.trackerComponent[0]] = self.trackerComponent[1]
+        return components
+
+    def getConfigTopics(self):
+        """Get the discovery config topics of the node"""
+        if self.deviceConfigTopic is not None:
+            return [self.deviceConfigTopic]
+        topics = [
+            topic for configs in self.sensorConfigs.values() for _, topic, _ in configs
+        ]
+        topics.append(self.trackerConfigTopic)
+        return topics
+
+
+class ChannelEntry:
+    """Precomputed topics and discovery payload of a channel text entity."""
+
+    __slots__ = ("name", "channelName", "stateTopic", "configTopic", "config")
+
+    def __init__(self, name, channelName, topicPrefix):
+        """Constructor for the ChannelEntry class"""
+        self.name = name
+        # Channel name without special characters
+        self.channelName = channelName
+        self.stateTopic = f"{topicPrefix}/{channelName.lower()}/state"
+        self.configTopic = f"homeassistant/text/{channelName}/config"
+        jsonObj = {}
+        jsonObj["name"] = f"{name}"
+        jsonObj["unique_id"] = f"channel_{channelName.lower()}"
+        jsonObj["command_topic"] = f"{topicPrefix}/{channelName.lower()}/command"
+        jsonObj["state_topic"] = self.stateTopic
+        jsonObj["value_template"] = "{{ value_json.text }}"
+        jsonObj["mode"] = "text"
+        jsonObj["icon"] = "mdi:message-text"
+        self.config = dumps(jsonObj)
+
+
+class TopicCache:
+    """Cache of precomputed per node and per channel topics and payloads.
+
+    Nodes are keyed by fromId, a renamed node gets a fresh entry. At most
+    maxNodes nodes are kept, the node seen least recently is evicted first.
+    Nodes not seen for ttl seconds are evicted, too.
+    """
+
+    def __init__(
+        self,
+        topicPrefix,
+        specialChars,
+        sensorsByTopic,
+        deviceDiscovery=False,
+        availability=False,
+        maxNodes=10000,
+        ttl=604800,
+        clock=time.monotonic,
+    ):
+        """Constructor for the TopicCache class"""
+        self.lock = threading.Lock()
+        self.topicPrefix = topicPrefix
+        self.specialChars = specialChars
+        self.sensorsByTopic = sensorsByTopic
+        self.deviceDiscovery = deviceDiscovery
+        self.availability = availability
+        self.maxNodes = max(1, int(maxNodes))
+        self.ttl = float(ttl)
+        self.clock = clock
+        # fromId -> NodeEntry, least recently seen first
+        self.nodes = OrderedDict()
+        # Nodes evicted since the last expire
+        self.evicted = []
+        self.channels = {}
+
+    def setTopicPrefix(self, topicPrefix):
+        """Set the MQTT topic prefix, invalidates all entries when it changed"""
+        with self.lock:
+            if topicPrefix == self.topicPrefix:
+                # Keep the node state, i.e. the online nodes of the snapshot
+                return
+            self.topicPrefix = topicPrefix
+            self.nodes.clear()
+            self.channels.clear()
+
+    def setSensorsByTopic(self, sensorsByTopic):
+        """Set the sensors indexed by state topic, invalidates all node entries"""
+        with self.lock:
+            self.sensorsByTopic = sensorsByTopic
+            self.nodes.clear()
+
+    def setDeviceDiscovery(self, deviceDiscovery):
+        """Use one device discovery config per node instead of one config per entity"""
+        with self.lock:
+            if deviceDiscovery == self.deviceDiscovery:
+                return
+            self.deviceDiscovery = deviceDiscovery
+            self.nodes.clear()
+
+    def setAvailability(self, availability):
+        """Reference per node availability topics in the discovery configs.
+
+        Invalidates all node entries when changed.
+        """
+        with self.lock:
+            if availability == self.availability:
+                return
+            self.availability = availability
+            self.nodes.clear()
+
+    def setLimits(self, maxNodes, ttl):
+        """Set the maximum number of nodes and the seconds an unseen node is kept"""
+        with self.lock:
+            self.maxNodes = max(1, int(maxNodes))
+            self.ttl = float(ttl)
+
+    def getNode(self, fromId, shortName):
+        """Get the cache entry of a node, created on first use, and mark it seen"""
+        now = self.clock()
+        entry = self.nodes.get(fromId)
+        with self.lock:
+            if entry is None or entry.shortName != shortName:
+                nodeId = self.specialChars.sub("", fromId)
+                # Replaces the entry of a previous short name
+                entry = self.nodes[fromId] = NodeEntry(
+                    fromId, shortName, nodeId, self.topicPrefix, self.sensorsByTopic,
+                    self.deviceDiscovery, self.availability,
+                )
+                if len(self.nodes) > self.maxNodes:
+                    self.evicted.append(self.nodes.popitem(last=False)[1])
+            self.nodes.move_to_end(fromId)
+            entry.lastSeen = now
+        return entry
+
+    def restoreNode(self, fromId, shortName, age):
+        """Get the cache entry of a node of the snapshot, last seen age seconds ago.
+
+        Restore the nodes seen least recently first to keep the eviction order.
+        """
+        entry = self.getNode(fromId, shortName)
+        with self.lock:
+            entry.lastSeen = self.clock() - age
+        return entry
+
+    def getConfigTopics(self, fromId, shortName):
+        """Get the discovery config topics of a node, cached or not"""
+        entry = self.findNode(fromId)
+        if entry is None or entry.shortName != shortName:
+            nodeId = self.specialChars.sub("", fromId)
+            entry = NodeEntry(
+                fromId, shortName, nodeId, self.topicPrefix, self.sensorsByTopic,
+                self.deviceDiscovery, self.availability,
+            )
+        return entry.getConfigTopics()
+
+    def getAges(self):
+        """Get the seconds since each cached node was seen, by node id"""
+        now = self.clock()
+        with self.lock:
+            return {
+                fromId: now - entry.lastSeen for fromId, entry in self.nodes.items()
+            }
+
+    def findNode(self, fromId):
+        """Get the cache entry of a node without marking it seen, None when unknown"""
+        with self.lock:
+            return self.nodes.get(fromId)
+
+    def expire(self, offlineAfter=0):
+        """Evict and mark offline nodes not seen for ttl and offlineAfter seconds.
+
+        Returns the list of nodes which went offline or were evicted while online,
+        and the list of all nodes evicted since the last call.
+        """
+        now = self.clock()
+        with self.lock:
+            evicted = self.evicted
+            self.evicted = []
+            # The nodes seen least recently are first in order
+            while self.nodes:
+                entry = next(iter(self.nodes.values()))
+                if now - entry.lastSeen < self.ttl:
+                    break
+                self.nodes.popitem(last=False)
+                evicted.append(entry)
+            offline = [entry for entry in evicted if entry.online]
+            if offlineAfter > 0:
+                for entry in self.nodes.values():
+                    if now - entry.lastSeen < offlineAfter:
+                        break
+                    if entry.online:
+                        offline.append(entry)
+        for entry in offline:
+            entry.online = False
+        return offline, evicted
+
+    def getOnline(self):
+        """Get the ids of the online nodes"""
+        with self.lock:
+            return [fromId for fromId, entry in self.nodes.items() if entry.online]
+
+    def getChannel(self, name):
+        """Get the cache entry of a channel, created on first use"""
+        entry = self.channels.get(name)
+        if entry is None:
+            channelName = self.specialChars.sub("", name)
+            entry = ChannelEntry(name, channelName, self.topicPrefix)
+            with self.lock:
+                self.channels[name] = entry
+        return entry
+
+    def clear(self):
+        """Remove all entries"""
+        with self.lock:
+            self.nodes.clear()
+            self.channels.clear()
@@ -0,0 +1,297 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import base64
+import gzip
+import json
+import threading
+import time
+
+# Capture file format version
+CAPTURE_VERSION = 1
+
+
+def toJsonable(obj):
+    """Convert a packet into JSON serializable types.
+
+    Bytes are base64 encoded, decoded protobuf objects under the raw key are dropped.
+    """
+    if isinstance(obj, dict):
+        return {str(k): toJsonable(v) for k, v in obj.items() if k != "raw"}
+    if isinstance(obj, (list, tuple)):
+        return [toJsonable(v) for v in obj]
+    if isinstance(obj, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(obj)).decode("ascii")}
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    return str(obj)
+
+
+def fromJsonable(obj):
+    """Restore bytes in a packet converted by toJsonable"""
+    if isinstance(obj, dict):
+        if len(obj) == 1 and "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+        return {k: fromJsonable(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [fromJsonable(v) for v in obj]
+    return obj
+
+
+class Recorder:
+    """Writes received packets and node entries into a gzip compressed JSONL capture."""
+
+    def __init__(self, path, flushInterval=1.0):
+        """Constructor for the Recorder class"""
+        self.path = path
+        self.file = gzip.open(path, "at", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.flushInterval = flushInterval
+        self.lastFlush = time.monotonic()
+        # fromId -> last recorded node entry, nodes are only recorded on change
+        self.nodes = {}
+        self.count = 0
+
+    def writeHeader(self, channelList, radio=None):
+        """Write the capture header with the channel list of a radio"""
+        header = {
+            "type": "header",
+            "version": CAPTURE_VERSION,
+            "channels": list(channelList),
+        }
+        if radio is not None:
+            header["radio"] = radio
+        self._write(header)
+
+    def record(self, packet, interface, radio=None):
+        """Record a received packet and its sender node entry"""
+        record = {"type": "packet", "t": time.time(), "packet": toJsonable(packet)}
+        if radio is not None:
+            record["radio"] = radio
+        fromId = packet.get("fromId")
+        nodes = getattr(interface, "nodes", None) or {}
+        node = nodes.get(fromId)
+        if node is not None:
+            node = toJsonable(node)
+            if self.nodes.get(fromId) != node:
+                self.nodes[fromId] = node
+                record["node"] = node
+        self._write(record)
+
+    def close(self):
+        """Close the capture file"""
+        with self.lock:
+            self.file.close()
+
+    def _write(self, record):
+        """Write a record line, flushed at most once per flush interval"""
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.count += 1
+            now = time.monotonic()
+            if now - self.lastFlush >= self.flushInterval:
+                self.lastFlush = now
+                self.file.flush()
+
+
+def readCapture(path):
+    """Read records from a capture, a truncated capture ends at its last record."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        try:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Incomplete last line of an interrupted capture
+                    break
+                yield fromJsonable(record)
+        except EOFError:
+            # Capture was not closed properly
+            return
+
+
+class FakeNode:
+    """Stand-in for the local Meshtastic node, without channels by default."""
+
+    def __init__(self, channels=None):
+        """Constructor for the FakeNode class"""
+        self.channels = channels or []
+
+    def getChannelByChannelIndex(self, channelIndex):
+        """Get a channel by its index, None when not existing"""
+        if 0 <= channelIndex < len(self.channels):
+            return self.channels[channelIndex]
+        return None
+
+
+class FakeInterface:
+    """Stand-in for a Meshtastic interface with a node DB."""
+
+    def __init__(self, nodes=None, channels=None):
+        """Constructor for the FakeInterface class"""
+        self.nodes = nodes if nodes is not None else {}
+        self.localNode = FakeNode(channels)
+        self.sent = []
+
+    def sendText(self, text, destinationId="^all", **kwargs):
+        """Record a text instead of sending it to the mesh"""
+        self.sent.append((text, destinationId, kwargs))
+
+    def close(self):
+        """Nothing to close"""
+        pass
+
+
+class FakeMessageInfo:
+    """Stand-in for paho MQTTMessageInfo, always published."""
+
+    def __init__(self, mid):
+        """Constructor for the FakeMessageInfo class"""
+        self.mid = mid
+        self.rc = 0
+
+    def wait_for_publish(self, timeout=None):
+        """Already published"""
+        pass
+
+    def is_published(self):
+        """Already published"""
+        return True
+
+
+class FakeMQTTClient:
+    """In-process stand-in for the paho MQTT client, acknowledges every message."""
+
+    def __init__(self, keep=False):
+        """Constructor for the FakeMQTTClient class"""
+        self.on_publish = None
+        self.keep = keep
+        self.messages = []
+        self.mid = 0
+        self.count = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        """Count the message and acknowledge it"""
+        with self.lock:
+            self.mid += 1
+            mid = self.mid
+            self.count += 1
+            self.bytes += len(payload or b"")
+            if self.keep:
+                self.messages.append((topic, payload, qos, retain))
+        if self.on_publish is not None:
+            self.on_publish(self, None, mid, None, None)
+        return FakeMessageInfo(mid)
+
+    def subscribe(self, topics, qos=0):
+        """Nothing to subscribe"""
+        return (0, 0)
+
+
+def percentile(values, fraction):
+    """Get a percentile from sorted values"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * (len(values) - 1)))))
+    return values[index]
+
+
+def replay(path, handlers, getInterface, realtime=False, onHeader=None):
+    """Feed the packets of a capture through the handlers.
+
+    handlers maps a portnum to a list of handler functions, the None key holds
+    handlers receiving every packet. getInterface returns the interface of the
+    radio name recorded with a packet, None for captures of a single radio.
+    onHeader is invoked with each capture header before the packets of its
+    radio. Latencies of handlers receiving every packet are reported per
+    portnum, i.e. the dispatch to the telemetry, position and text handlers.
+    Returns a report dictionary.
+    """
+    latencies = {}
+    packets = 0
+    channels = []
+    firstTime = None
+    start = time.perf_counter()
+    for record in readCapture(path):
+        if record.get("type") == "header":
+            channels.extend(c for c in record.get("channels", []) if c not in channels)
+            if onHeader is not None:
+                onHeader(record)
+            continue
+        if record.get("type") != "packet":
+            continue
+        packet = record["packet"]
+        interface = getInterface(record.get("radio"))
+        node = record.get("node")
+        if node is not None:
+            interface.nodes[packet.get("fromId")] = node
+        if realtime:
+            # Keep the original spacing of packets
+            if firstTime is None:
+                firstTime = record["t"]
+            delay = (record["t"] - firstTime) - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        portnum = packet.get("decoded", {}).get("portnum")
+        for handler in handlers.get(portnum, []):
+            t0 = time.perf_counter()
+            handler(packet, interface)
+            latencies.setdefault(handler.__name__, []).append(time.perf_counter() - t0)
+        for handler in handlers.get(None, []):
+            t0 = time.perf_counter()
+            handler(packet, interface)
+            name = f"{handler.__name__} {portnum or 'ENCRYPTED'}"
+            latencies.setdefault(name, []).append(time.perf_counter() - t0)
+        packets += 1
+    elapsed = time.perf_counter() - start
+    report = {
+        "packets": packets,
+        "channels": channels,
+        "elapsed": elapsed,
+        "packetsPerSecond": packets / elapsed if elapsed > 0 else 0.0,
+        "handlers": {},
+    }
+    for name, values in latencies.items():
+        values.sort()
+        report["handlers"][name] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": percentile(values, 0.50),
+            "p99": percentile(values, 0.99),
+            "max": values[-1],
+        }
+    return report
+
+
+def printReport(report):
+    """Print a replay report"""
+    print(
+        f"Replay: {report['packets']} packets in {report['elapsed']:.3f} s, "
+        f"{report['packetsPerSecond']:.1f} packets/s"
+    )
+    for name, stats in sorted(report["handlers"].items()):
+        print(
+            f"  {name}: {stats['count']} calls, "
+            f"mean {stats['mean'] * 1e6:.1f} us, p50 {stats['p50'] * 1e6:.1f} us, "
+            f"p99 {stats['p99'] * 1e6:.1f} us, max {stats['max'] * 1e6:.1f} us"
+        )
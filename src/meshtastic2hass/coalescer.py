@@ -0,0 +1,95 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import threading
+import time
+
+
+class Coalescer:
+    """Rate limit of telemetry state messages per node and topic.
+
+    The first message of a topic is published immediately. Messages arriving
+    within the minimum interval after that are merged, latest value wins, and
+    published as one message when the interval has expired.
+    """
+
+    def __init__(self, interval=0, topicIntervals=None, clock=time.monotonic):
+        """Constructor for the Coalescer class"""
+        self.interval = float(interval)
+        # State topic suffix -> minimum interval, overrides the default interval
+        self.topicIntervals = {k: float(v) for k, v in (topicIntervals or {}).items()}
+        self.clock = clock
+        self.lock = threading.Lock()
+        # Topic -> time of last published message
+        self.lastPublish = {}
+        # Topic -> [deadline, merged message]
+        self.pending = {}
+        self.lastPrune = clock()
+        self.coalesced = 0
+
+    def getInterval(self, suffix):
+        """Get the minimum interval of a state topic suffix, i.e. device"""
+        return self.topicIntervals.get(suffix, self.interval)
+
+    def submit(self, topic, suffix, jsonObj):
+        """Submit a state message.
+
+        Returns the message when it shall be published now, otherwise None.
+        """
+        interval = self.getInterval(suffix)
+        if interval <= 0:
+            return jsonObj
+        now = self.clock()
+        with self.lock:
+            pending = self.pending.get(topic)
+            if pending is not None:
+                pending[1].update(jsonObj)
+                self.coalesced += 1
+                return None
+            last = self.lastPublish.get(topic)
+            if last is None or now - last >= interval:
+                self.lastPublish[topic] = now
+                return jsonObj
+            self.pending[topic] = [last + interval, dict(jsonObj)]
+            self.coalesced += 1
+            return None
+
+    def flush(self, force=False):
+        """Get all merged messages with expired deadline as list of (topic, message)."""
+        now = self.clock()
+        due = []
+        with self.lock:
+            for topic, (deadline, jsonObj) in self.pending.items():
+                if force or deadline <= now:
+                    due.append((topic, jsonObj))
+            for topic, _ in due:
+                del self.pending[topic]
+                self.lastPublish[topic] = now
+            # Forget topics that are quiet for longer than any interval
+            maxInterval = max([self.interval, *self.topicIntervals.values()])
+            if now - self.lastPrune >= maxInterval:
+                self.lastPrune = now
+                self.lastPublish = {
+                    t: last
+                    for t, last in self.lastPublish.items()
+                    if now - last < maxInterval
+                }
+        return due
+
+    def getPending(self):
+        """Get the number of topics with merged messages waiting for publish"""
+        return len(self.pending)
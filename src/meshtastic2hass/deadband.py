@@ -0,0 +1,134 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import math
+import threading
+import time
+from array import array
+
+
+def parseDeadband(deadband):
+    """Parse a deadband, a number or a string ending with % for a relative deadband.
+
+    Returns the tuple (absolute, relative).
+    """
+    if isinstance(deadband, str):
+        text = deadband.strip()
+        if text.endswith("%"):
+            return 0.0, float(text[:-1]) / 100
+        return float(text), 0.0
+    return float(deadband or 0), 0.0
+
+
+class LastState:
+    """Last published values of a state topic, in order of the sensors of the topic."""
+
+    __slots__ = ("time", "values", "texts")
+
+    def __init__(self, now, size):
+        """Constructor for the LastState class"""
+        self.time = now
+        # NaN marks a value not published yet, or published as non-numeric value
+        self.values = array("d", [math.nan]) * size
+        # Sensor index -> last published non-numeric value, i.e. a string
+        self.texts = {}
+
+
+class Deadband:
+    """Change only publishing of telemetry state messages per node and topic.
+
+    A state message is published when at least one of its sensor values
+    changed by its deadband or more since the last published message, a
+    non-numeric value when it is not equal to the last published one, or
+    when heartbeat seconds passed since then. A heartbeat of 0 publishes
+    every message. The last published values are kept in the node entry,
+    so they are evicted together with the node.
+    """
+
+    def __init__(
+        self, sensorsByTopic=None, heartbeat=0, deadbands=None, clock=time.monotonic
+    ):
+        """Constructor for the Deadband class"""
+        self.heartbeat = float(heartbeat)
+        self.clock = clock
+        self.lock = threading.Lock()
+        deadbands = deadbands or {}
+        # State topic suffix -> tuple of (property, absolute and relative deadband)
+        self.sensors = {}
+        for suffix, sensors in (sensorsByTopic or {}).items():
+            self.sensors[suffix] = tuple(
+                (
+                    sensor.property,
+                    *parseDeadband(deadbands.get(sensor.id, sensor.deadband)),
+                )
+                for sensor in sensors
+            )
+        self.suppressed = 0
+
+    def _isChanged(self, sensors, state, jsonObj):
+        """Check whether a value of a message left its deadband"""
+        values = state.values
+        texts = state.texts
+        for i, (prop, absolute, relative) in enumerate(sensors):
+            value = jsonObj.get(prop)
+            if value is None:
+                continue
+            if not isinstance(value, (int, float)):
+                if i not in texts or texts[i] != value:
+                    return True
+                continue
+            last = values[i]
+            if math.isnan(last):
+                return True
+            band = max(absolute, abs(last) * relative)
+            if abs(value - last) >= band if band > 0 else value != last:
+                return True
+        return False
+
+    def submit(self, node, suffix, jsonObj):
+        """Submit a state message of a node, returns True when it shall be published."""
+        if self.heartbeat <= 0:
+            return True
+        sensors = self.sensors.get(suffix)
+        if not sensors:
+            return True
+        now = self.clock()
+        with self.lock:
+            if node.states is None:
+                node.states = {}
+            state = node.states.get(suffix)
+            if state is None:
+                state = node.states[suffix] = LastState(now, len(sensors))
+            elif now - state.time < self.heartbeat and not self._isChanged(
+                sensors, state, jsonObj
+            ):
+                self.suppressed += 1
+                return False
+            state.time = now
+            values = state.values
+            texts = state.texts
+            for i, (prop, _, _) in enumerate(sensors):
+                value = jsonObj.get(prop)
+                if isinstance(value, (int, float)):
+                    values[i] = value
+                    if texts:
+                        texts.pop(i, None)
+                elif value is not None:
+                    # The array holds numbers only
+                    values[i] = math.nan
+                    texts[i] = value
+        return True
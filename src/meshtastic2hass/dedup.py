@@ -0,0 +1,76 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import threading
+import time
+from collections import OrderedDict
+
+
+class SeenPackets:
+    """Bounded, time expiring cache of seen mesh packets.
+
+    Packets are identified by sender and packet id. Lookup is O(1), the oldest
+    entries are evicted when the capacity is reached or their TTL has expired.
+    """
+
+    def __init__(self, capacity=4096, ttl=600, clock=time.monotonic):
+        """Constructor for the SeenPackets class"""
+        self.capacity = int(capacity)
+        self.ttl = float(ttl)
+        self.clock = clock
+        self.lock = threading.Lock()
+        # (from, id, kind) -> time first seen, in insertion order
+        self.seen = OrderedDict()
+        # kind -> number of dropped duplicates
+        self.duplicates = {}
+
+    def isDuplicate(self, packet, kind):
+        """Check a packet and remember it, returns True when it was seen before.
+
+        kind separates handlers receiving the same packet, i.e. telemetry.
+        """
+        if self.capacity <= 0:
+            return False
+        packetId = packet.get("id")
+        if not packetId:
+            # Without packet id duplicates can not be identified
+            return False
+        key = (packet.get("from"), packetId, kind)
+        now = self.clock()
+        with self.lock:
+            # Expire old entries, the oldest are first in order
+            seen = self.seen
+            while seen:
+                oldest = next(iter(seen.values()))
+                if now - oldest < self.ttl:
+                    break
+                seen.popitem(last=False)
+            if key in seen:
+                self.duplicates[kind] = self.duplicates.get(kind, 0) + 1
+                return True
+            seen[key] = now
+            if len(seen) > self.capacity:
+                seen.popitem(last=False)
+            return False
+
+    def getDuplicates(self):
+        """Get the number of dropped duplicates per kind"""
+        with self.lock:
+            return dict(self.duplicates)
+
+    def __len__(self):
+        return len(self.seen)
@@ -0,0 +1,107 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import threading
+
+from .serializer import dumps
+
+
+class DiscoveryRegistry:
+    """Registry of Home Assistant discovery configs announced via MQTT.
+
+    Every config is published once as retained message and only published
+    again when its payload changes or Home Assistant comes back online.
+    """
+
+    def __init__(self):
+        """Constructor for the DiscoveryRegistry class"""
+        self.lock = threading.Lock()
+        # Config topic -> last announced payload
+        self.configs = {}
+
+    def announce(self, publisher, topic, jsonObj):
+        """Publish a discovery config when it is new or changed.
+
+        Returns True when the config was published.
+        """
+        return self.announcePayload(publisher, topic, dumps(jsonObj))
+
+    def announcePayload(self, publisher, topic, payload):
+        """Publish an encoded discovery config when it is new or changed.
+
+        Returns True when the config was published.
+        """
+        with self.lock:
+            if self.configs.get(topic) == payload:
+                return False
+            self.configs[topic] = payload
+        publisher.publish(topic, payload, qos=1, retain=True)
+        return True
+
+    def get(self, topic):
+        """Get the announced payload of a config topic, None when not announced"""
+        with self.lock:
+            return self.configs.get(topic)
+
+    def replay(self, publisher):
+        """Publish all known discovery configs again, i.e. on Home Assistant birth."""
+        with self.lock:
+            configs = list(self.configs.items())
+        for topic, payload in configs:
+            publisher.publish(topic, payload, qos=1, retain=True)
+        return len(configs)
+
+    def remove(self, topics):
+        """Forget the configs of topics, i.e. of evicted nodes, returns the count"""
+        removed = 0
+        with self.lock:
+            for topic in topics:
+                if self.configs.pop(topic, None) is not None:
+                    removed += 1
+        return removed
+
+    def retire(self, publisher, topics):
+        """Delete the announced configs of topics in HA, i.e. of a renamed node.
+
+        An empty retained message removes the entity, returns the count.
+        """
+        with self.lock:
+            retired = [
+                topic for topic in topics if self.configs.pop(topic, None) is not None
+            ]
+        for topic in retired:
+            publisher.publish(topic, b"", qos=1, retain=True)
+        return len(retired)
+
+    def export(self):
+        """Get all known discovery configs as dictionary topic -> payload text"""
+        with self.lock:
+            return {
+                topic: payload.decode("utf-8")
+                for topic, payload in self.configs.items()
+            }
+
+    def restore(self, configs):
+        """Restore the discovery configs of a previous run, replayed on connect"""
+        with self.lock:
+            for topic, payload in configs.items():
+                self.configs.setdefault(topic, payload.encode("utf-8"))
+
+    def clear(self):
+        """Forget all announced configs"""
+        with self.lock:
+            self.configs.clear()
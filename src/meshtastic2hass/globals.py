@@ -15,6 +15,24 @@
 # You should have received a copy of the GNU General Public License
 # along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
 #
+import re
+
+from .cache import TopicCache
+from .coalescer import Coalescer
+from .deadband import Deadband
+from .dedup import SeenPackets
+from .discovery import DiscoveryRegistry
+from .metrics import BridgeMetrics
+from .nodefilter import NodeFilter
+from .pending import PendingPackets
+from .position import PositionFilter
+from .publisher import Publisher
+from .scheduler import OutboundScheduler
+from .sensors import compileSensors
+from .startup import StartupProfile
+from .tracing import Tracer
+
+
 class Globals:
     """Globals class is a Singleton."""
 
@@ -37,185 +55,33 @@ class Globals:
         self.parser = None
         self.loop = None
         self.mqtt = None
-        self.interface = None
-        self.specialChars = r'[!]'
-        # Home Assistant sensor configuration send via MQTT.
-        self.mqttSensors = [
-            dict(
-                id="battery_voltage",
-                name="Battery Voltage",
-                state_topic="device",
-                device_class="voltage",
-                unit="V",
-                property="voltage",
-                type="float",
-            ),
-            dict(
-                id="battery_percent",
-                name="Battery Level",
-                state_topic="device",
-                device_class="battery",
-                unit="%",
-                property="batteryLevel",
-                type="float",
-            ),
-            dict(
-                id="chutil",
-                name="Channel Util",
-                state_topic="device",
-                device_class=None,
-                unit="%",
-                property="channelUtilization",
-                type="float",
-            ),
-            dict(
-                id="airutiltx",
-                name="Air Util Tx",
-                state_topic="device",
-                device_class=None,
-                unit="%",
-                property="airUtilTx",
-                type="float",
-            ),
-            dict(
-                id="temperature",
-                name="Temperature",
-                state_topic="environment",
-                device_class="temperature",
-                unit="°C",
-                property="temperature",
-                type="float",
-            ),
-            dict(
-                id="humidity",
-                name="Humidity",
-                state_topic="environment",
-                device_class="humidity",
-                unit="%",
-                property="relativeHumidity",
-                type="float",
-            ),
-            dict(
-                id="pressure",
-                name="Pressure",
-                state_topic="environment",
-                device_class="atmospheric_pressure",
-                unit="hPa",
-                property="barometricPressure",
-                type="float",
-            ),
-            dict(
-                id="voltage",
-                name="Voltage",
-                state_topic="environment",
-                device_class="voltage",
-                unit="V",
-                property="voltage",
-                type="float",
-            ),
-            dict(
-                id="current",
-                name="Current",
-                state_topic="environment",
-                device_class="current",
-                unit="mA",
-                property="current",
-                type="float",
-            ),
-            dict(
-                id="rssi",
-                name="RSSI",
-                state_topic="device",
-                device_class="signal_strength",
-                unit="dBm",
-                property="rssi",
-                type="int",
-            ),
-            dict(
-                id="snr",
-                name="SNR",
-                state_topic="device",
-                device_class=None,
-                unit=None,
-                property="snr",
-                type="float",
-            ),
-            dict(
-                id="uptime",
-                name="Uptime",
-                state_topic="device",
-                device_class="duration",
-                unit="s",
-                property="uptimeSeconds",
-                type="int",
-            ),
-            dict(
-                id="hopdistance",
-                name="Hop Distance",
-                state_topic="device",
-                device_class=None,
-                unit=None,
-                property="hopDistance",
-                type="int",
-            ),
-            dict(
-                id="ch1_voltage",
-                name="Voltage Sensor 1",
-                state_topic="power",
-                device_class="voltage",
-                unit="V",
-                property="ch1Voltage",
-                type="float",
-            ),
-            dict(
-                id="ch1_current",
-                name="Current Sensor 1",
-                state_topic="power",
-                device_class="current",
-                unit="mA",
-                property="ch1Current",
-                type="float",
-            ),
-            dict(
-                id="ch2_voltage",
-                name="Voltage Sensor 2",
-                state_topic="power",
-                device_class="voltage",
-                unit="V",
-                property="ch2Voltage",
-                type="float",
-            ),
-            dict(
-                id="ch2_current",
-                name="Current Sensor 2",
-                state_topic="power",
-                device_class="current",
-                unit="mA",
-                property="ch2Current",
-                type="float",
-            ),
-            dict(
-                id="ch3_voltage",
-                name="Voltage Sensor 3",
-                state_topic="power",
-                device_class="voltage",
-                unit="V",
-                property="ch3Voltage",
-                type="float",
-            ),
-            dict(
-                id="ch3_current",
-                name="Current Sensor 3",
-                state_topic="power",
-                device_class="current",
-                unit="mA",
-                property="ch3Current",
-                type="float",
-            ),
-        ]
+        self.mqttLoop = None
+        # Radio contexts, packets of all radios are merged into one pipeline
+        self.radios = []
+        self.radiosByInterface = {}
+        # Node id -> short name of nodes known from the snapshot or by fallback name
+        self.knownNodes = {}
+        # Compiled once, used on every packet
+        self.specialChars = re.compile(r'[!]')
+        # Home Assistant sensors, compiled on first use from built-ins and config.toml
+        self.sensorRegistry = None
         self.mqttTopicPrefix = "msh/2/json"
-        self.channelList = []
-        self.filterNodes = []
+        self.nodeFilter = NodeFilter()
+        self.hassStatusTopic = "homeassistant/status"
+        self.metrics = BridgeMetrics()
+        self.discovery = DiscoveryRegistry()
+        self.publisher = Publisher()
+        self.coalescer = Coalescer()
+        self.deadband = Deadband()
+        self.positionFilter = PositionFilter()
+        self.seenPackets = SeenPackets()
+        self.pendingPackets = PendingPackets()
+        self.scheduler = OutboundScheduler()
+        self.recorder = None
+        self.tracer = Tracer()
+        self.startupProfile = StartupProfile()
+        # The sensors are set by getTopicCache once the registry is compiled
+        self.topicCache = TopicCache(self.mqttTopicPrefix, self.specialChars, {})
 
     def reset(self):
         """Reset all of our globals. If you add a member, add it to this method, too."""
@@ -223,8 +89,28 @@ class Globals:
         self.parser = None
         self.loop = None
         self.mqtt = None
-        self.interface = None
+        self.mqttLoop = None
+        self.radios = []
+        self.radiosByInterface = {}
+        # Node id -> short name of nodes known from the snapshot or by fallback name
+        self.knownNodes = {}
+        self.sensorRegistry = None
         self.mqttTopicPrefix = "msh/2/json"
+        self.hassStatusTopic = "homeassistant/status"
+        self.metrics = BridgeMetrics()
+        self.discovery = DiscoveryRegistry()
+        self.publisher = Publisher()
+        self.coalescer = Coalescer()
+        self.deadband = Deadband()
+        self.positionFilter = PositionFilter()
+        self.seenPackets = SeenPackets()
+        self.pendingPackets = PendingPackets()
+        self.scheduler = OutboundScheduler()
+        self.recorder = None
+        self.tracer = Tracer()
+        self.startupProfile = StartupProfile()
+        # The sensors are set by getTopicCache once the registry is compiled
+        self.topicCache = TopicCache(self.mqttTopicPrefix, self.specialChars, {})
 
     # setters
     def setArgs(self, args):
@@ -243,17 +129,110 @@ class Globals:
         """Set the MQTT client"""
         self.mqtt = mqtt
 
+    def setMQTTLoop(self, mqttLoop):
+        """Set the helper driving the MQTT client from the event loop"""
+        self.mqttLoop = mqttLoop
+
     def setTopicPrefix(self, prefix):
         """Set the MQTT topic prefix"""
         self.mqttTopicPrefix = prefix
+        self.topicCache.setTopicPrefix(prefix)
+
+    def setSensorRegistry(self, sensorRegistry):
+        """Set the compiled registry of HA sensors, invalidates the topic cache"""
+        self.sensorRegistry = sensorRegistry
+        self.topicCache.setSensorsByTopic(sensorRegistry.byTopic)
+
+    def setAvailability(self, availability):
+        """Publish per node availability topics referenced by the discovery configs"""
+        self.topicCache.setAvailability(availability)
+
+    def setNodeLimits(self, maxNodes, ttl):
+        """Set the cached node limit and the seconds to keep unseen nodes"""
+        self.topicCache.setLimits(maxNodes, ttl)
+
+    def setDeviceDiscovery(self, deviceDiscovery):
+        """Announce one Home Assistant device discovery config per node"""
+        self.topicCache.setDeviceDiscovery(deviceDiscovery)
+
+    def setNodeFilter(self, nodeFilter):
+        """Set the node filter"""
+        self.nodeFilter = nodeFilter
+
+    def addRadio(self, radio):
+        """Add a radio context"""
+        self.radios.append(radio)
+        self.registerInterface(radio)
+
+    def registerInterface(self, radio):
+        """Map the Meshtastic interface of a radio context to the context"""
+        if radio.interface is not None:
+            self.radiosByInterface[radio.interface] = radio
+
+    def unregisterInterface(self, interface):
+        """Forget the Meshtastic interface of a radio, i.e. after connection loss"""
+        self.radiosByInterface.pop(interface, None)
+
+    def setKnownNodes(self, knownNodes):
+        """Set the short names of nodes known from the warm start snapshot"""
+        self.knownNodes = knownNodes
+
+    def addKnownNode(self, fromId, shortName):
+        """Set the short name of a node unknown to the node DBs, i.e. its fallback"""
+        self.knownNodes[fromId] = shortName
+
+    def removeKnownNodes(self, fromIds):
+        """Forget the short names of nodes, i.e. of nodes evicted from the cache"""
+        for fromId in fromIds:
+            self.knownNodes.pop(fromId, None)
+
+    def setPublisher(self, publisher):
+        """Set the MQTT publisher"""
+        self.publisher = publisher
+
+    def setCoalescer(self, coalescer):
+        """Set the telemetry coalescer"""
+        self.coalescer = coalescer
+
+    def setDeadband(self, deadband):
+        """Set the change only filter of telemetry state messages"""
+        self.deadband = deadband
+
+    def setPositionFilter(self, positionFilter):
+        """Set the movement filter of position updates"""
+        self.positionFilter = positionFilter
+
+    def setSeenPackets(self, seenPackets):
+        """Set the seen packets cache for duplicate suppression"""
+        self.seenPackets = seenPackets
+
+    def setPendingPackets(self, pendingPackets):
+        """Set the buffer of packets from nodes without node info"""
+        self.pendingPackets = pendingPackets
+
+    def setScheduler(self, scheduler):
+        """Set the outbound scheduler of text messages to the mesh"""
+        self.scheduler = scheduler
+
+    def setRecorder(self, recorder):
+        """Set the packet capture recorder"""
+        self.recorder = recorder
 
-    def setFilterNodes(self, filterNodes):
-        """Set node short names to be included in filter"""
-        self.filterNodes = filterNodes
+    def setTracer(self, tracer):
+        """Set the packet latency tracer"""
+        self.tracer = tracer
 
-    def setMeshtasticInterface(self, interface):
-        """Set the Meshtastic interface"""
-        self.interface = interface
+    def setStartupProfile(self, startupProfile):
+        """Set the profile of the startup stages"""
+        self.startupProfile = startupProfile
+
+    def setMetrics(self, metrics):
+        """Set the bridge metrics"""
+        self.metrics = metrics
+
+    def setHassStatusTopic(self, topic):
+        """Set the Home Assistant birth and last will topic"""
+        self.hassStatusTopic = topic
 
     # getters
     def getArgs(self):
@@ -272,26 +251,102 @@ class Globals:
         """Get the MQTT client"""
         return self.mqtt
 
+    def getMQTTLoop(self):
+        """Get the helper driving the MQTT client from the event loop, None with paho"""
+        return self.mqttLoop
+
+    def getSensorRegistry(self):
+        """Get the compiled registry of HA sensors, the built-in sensors unless set"""
+        if self.sensorRegistry is None:
+            self.setSensorRegistry(compileSensors())
+        return self.sensorRegistry
+
     def getSensors(self):
         """Get the MQTT sensor configuration"""
-        return self.mqttSensors
+        return self.getSensorRegistry().sensors
+
+    def getSensorsByTopic(self):
+        """Get the MQTT sensor configuration indexed by state topic"""
+        return self.getSensorRegistry().byTopic
 
     def getTopicPrefix(self):
         """Get the MQTT topic prefix"""
         return self.mqttTopicPrefix
 
-    def getChannelList(self):
-        """Get the local nodes channel list"""
-        return self.channelList
-
     def getSpecialChars(self):
-        """Get a regex pattern of special characters to be removed from strings"""
+        """Get a compiled regex of special characters to be removed from strings"""
         return self.specialChars
 
-    def getFilterNodes(self):
-        """Get a set of node short names to be included in filter"""
-        return self.filterNodes
+    def getNodeFilter(self):
+        """Get the node filter"""
+        return self.nodeFilter
+
+    def getRadios(self):
+        """Get all radio contexts"""
+        return self.radios
+
+    def getRadio(self, interface):
+        """Get the radio context of a Meshtastic interface, None when unknown"""
+        return self.radiosByInterface.get(interface)
+
+    def getKnownNodes(self):
+        """Get the short names of nodes known from the warm start snapshot"""
+        return self.knownNodes
+
+    def getHassStatusTopic(self):
+        """Get the Home Assistant birth and last will topic"""
+        return self.hassStatusTopic
+
+    def getPublisher(self):
+        """Get the MQTT publisher"""
+        return self.publisher
+
+    def getTopicCache(self):
+        """Get the per node and per channel topic cache"""
+        if self.sensorRegistry is None:
+            self.getSensorRegistry()
+        return self.topicCache
+
+    def getCoalescer(self):
+        """Get the telemetry coalescer"""
+        return self.coalescer
+
+    def getDeadband(self):
+        """Get the change only filter of telemetry state messages"""
+        return self.deadband
+
+    def getPositionFilter(self):
+        """Get the movement filter of position updates"""
+        return self.positionFilter
+
+    def getSeenPackets(self):
+        """Get the seen packets cache for duplicate suppression"""
+        return self.seenPackets
+
+    def getPendingPackets(self):
+        """Get the buffer of packets from nodes without node info"""
+        return self.pendingPackets
+
+    def getScheduler(self):
+        """Get the outbound scheduler of text messages to the mesh"""
+        return self.scheduler
+
+    def getRecorder(self):
+        """Get the packet capture recorder, None when not recording"""
+        return self.recorder
+
+    def getTracer(self):
+        """Get the packet latency tracer"""
+        return self.tracer
+
+    def getStartupProfile(self):
+        """Get the profile of the startup stages"""
+        return self.startupProfile
+
+    def getMetrics(self):
+        """Get the bridge metrics"""
+        return self.metrics
 
-    def getMeshtasticInterface(self):
-        """Get the Meshtastic interface"""
-        return self.interface
+    def getDiscovery(self):
+        """Get the Home Assistant discovery registry"""
+        return self.discovery
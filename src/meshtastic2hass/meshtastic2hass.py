@@ -19,21 +19,32 @@
 #
 import argparse
 import asyncio
+import functools
+import importlib
 import json
 import os
 import signal
+import socket
 import sys
-import re
+import threading
+import time
 
-import meshtastic
-import meshtastic.serial_interface
-import meshtastic.tcp_interface
-import paho.mqtt.client as mqttClient
-import random
+from . import capture, publisher
+from .coalescer import Coalescer
+from .deadband import Deadband
+from .dedup import SeenPackets
 from .globals import Globals
-from meshtastic import config_pb2, channel_pb2
-from pubsub import pub
-from tomlkit import toml_file
+from .nodefilter import NodeFilter
+from .pending import PendingPackets
+from .position import PositionFilter
+from .radio import RadioContext
+from .scheduler import OutboundScheduler
+from .sensors import compileSensors
+from .serializer import dumps
+from .snapshot import readSnapshot, writeSnapshot
+from .spool import Spool
+from .startup import StartupProfile
+from .tracing import Tracer
 
 __author__ = "Michael Wolf aka Mictronics"
 __copyright__ = "2025, (C) Michael Wolf"
@@ -41,58 +52,153 @@ __license__ = "GPL v3+"
 __version__ = "1.0.20"
 
 
-def onReceiveTelemetry(packet, interface, topic=pub.AUTO_TOPIC):
-    """Callback invoked when a telemetry or position packet arrives."""
-    # Create JSON from Mesh packet.
+def timedHandler(name):
+    """Decorator measuring the time spent in a packet handler"""
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                Globals.getInstance().getMetrics().handlerTime.observe(
+                    time.perf_counter() - t0, name
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def onEventLoop(callback):
+    """Decorator handing a callback over from a radio or paho thread to the event loop.
+
+    Without event loop, i.e. in replay and benchmark, the callback is invoked directly.
+    """
+
+    @functools.wraps(callback)
+    def wrapper(*args, **kwargs):
+        loop = Globals.getInstance().getLoop()
+        if loop is None or loop.is_closed():
+            return callback(*args, **kwargs)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return callback(*args, **kwargs)
+        loop.call_soon_threadsafe(functools.partial(callback, *args, **kwargs))
+
+    return wrapper
+
+
+def pauseWhenFull(callback):
+    """Decorator pausing the radio reader while the MQTT outbound queue is full.
+
+    Backpressure of the block overflow policy, the radio buffers packets meanwhile.
+    """
+
+    @functools.wraps(callback)
+    def wrapper(*args, **kwargs):
+        _globals = Globals.getInstance()
+        if _globals.getLoop() is not None:
+            _globals.getPublisher().waitForRoom()
+        return callback(*args, **kwargs)
+
+    return wrapper
+
+
+def traceReceipt(callback):
+    """Decorator starting the latency trace of a sampled packet on receipt."""
+
+    @functools.wraps(callback)
+    def wrapper(packet, *args, **kwargs):
+        Globals.getInstance().getTracer().sample(packet)
+        return callback(packet, *args, **kwargs)
+
+    return wrapper
+
+
+def getNodeUser(fromId, interface):
+    """Get the user info of a node from the node DB of a radio, else of other radios"""
     _globals = Globals.getInstance()
-    mqtt = _globals.getMQTT()
-    sensors = _globals.getSensors()
-    topicPrefix = _globals.getTopicPrefix()
+    interfaces = [interface] + [
+        radio.interface
+        for radio in _globals.getRadios()
+        if radio.interface is not interface
+    ]
+    for iface in interfaces:
+        node = (getattr(iface, "nodes", None) or {}).get(fromId)
+        if node is not None:
+            user = node.get("user", {})
+            if user.get("shortName") is not None:
+                return user
+    return None
+
+
+def getShortName(fromId, interface):
+    """Get the short name of a node.
+
+    The node DBs of the other radios and the warm start snapshot are used when unknown.
+    """
+    user = getNodeUser(fromId, interface)
+    if user is not None:
+        return user["shortName"]
+    return Globals.getInstance().getKnownNodes().get(fromId)
+
+
+def announceDevice(node, interface, components):
+    """Announce the device discovery config of a node when it gained new components.
+
+    Components announced by a previous run, i.e. restored from the warm start
+    snapshot, are kept, so Home Assistant does not lose their entities.
+    """
+    if node.components is None:
+        node.components = {}
+        previous = Globals.getInstance().getDiscovery().get(node.deviceConfigTopic)
+        if previous is not None:
+            known = node.getComponents()
+            for componentId in json.loads(previous).get("components", {}):
+                if componentId in known:
+                    node.components[componentId] = known[componentId]
+    added = False
+    for componentId, component in components:
+        if componentId not in node.components:
+            node.components[componentId] = component
+            added = True
+    if not added:
+        return False
+    _globals = Globals.getInstance()
+    user = getNodeUser(node.fromId, interface) or {}
+    device = {}
+    device["identifiers"] = [f"meshtastic_{node.nodeId}"]
+    device["name"] = user.get("longName") or node.shortName
+    device["manufacturer"] = "Meshtastic"
+    if user.get("hwModel"):
+        device["model"] = user["hwModel"]
+    device["serial_number"] = node.fromId
     jsonObj = {}
-    try:
-        fromId = packet.get("fromId")
-        shortName = interface.nodes.get(fromId).get("user").get("shortName")
-    except AttributeError:
-        fromId = packet.get("fromId")
-        print(f"Error shortname, id: {interface.nodes.get(fromId)}")
-        return
-    # Filter nodes
-    filterNodes = _globals.getFilterNodes()
-    if len(filterNodes) > 0:
-        try:
-            filterNodes.index(shortName)
-        except ValueError:
-            return
-    # No special characters allowed in Hass config topic
-    pattern = _globals.getSpecialChars()
-    fromId = re.sub(pattern, '', fromId)
-    # Publish auto discovery configuration for sensors
-    for sensor in sensors:
-        jsonObj.clear()
-        mqttTopic = f"homeassistant/sensor/{fromId}/{sensor['id']}/config"
-        jsonObj["name"] = f"{shortName} {sensor['name']}"
-        jsonObj["unique_id"] = f"{shortName.lower()}_{sensor['id']}"
-        jsonObj["state_topic"] = f"{topicPrefix}/{fromId}/{sensor['state_topic']}"
-        jsonObj["state_class"] = "measurement"
-        jsonObj["platform"] = "mqtt"
-        if sensor["device_class"]:
-            jsonObj["device_class"] = sensor["device_class"]
-        if sensor["unit"]:
-            jsonObj["unit_of_measurement"] = sensor["unit"]
-        if sensor["type"] == "float":
-            jsonObj["value_template"] = (
-                "{{ " + f"(value_json.{sensor['property']} | float) | round(1)" + " }}"
-            )
-        elif sensor["type"] == "int":
-            jsonObj["value_template"] = (
-                "{{ " + f"(value_json.{sensor['property']} | int)" + " }}"
-            )
+    jsonObj["device"] = device
+    jsonObj["origin"] = {"name": "meshtastic2hass", "sw_version": __version__}
+    if node.availabilityTopic is not None:
+        # Shared by all components
+        jsonObj["availability_topic"] = node.availabilityTopic
+    jsonObj["components"] = node.components
+    return _globals.getDiscovery().announce(
+        _globals.getPublisher(), node.deviceConfigTopic, jsonObj
+    )
+
 
-        mqtt.publish(
-            mqttTopic, json.dumps(jsonObj, separators=(",", ":")), qos=1
-        ).wait_for_publish(1)
+@timedHandler("telemetry")
+def onReceiveTelemetry(packet, interface, node):
+    """Handler invoked when a telemetry packet arrives."""
+    # Create JSON from Mesh packet.
+    _globals = Globals.getInstance()
+    publisher = _globals.getPublisher()
+    discovery = _globals.getDiscovery()
+    jsonObj = {}
     # Publish telemetry as sensor topics
-    jsonObj.clear()
     rssi = packet.get("rxRssi")
     if rssi:
         jsonObj["rssi"] = rssi
@@ -111,119 +217,225 @@ def onReceiveTelemetry(packet, interface, topic=pub.AUTO_TOPIC):
     # Each telemetry type has its own topic
     telemetry = packet.get("decoded").get("telemetry")
     if telemetry:
-        devMetrics = telemetry.get("deviceMetrics")
-        envMetrics = telemetry.get("environmentMetrics")
-        powerMetrics = telemetry.get("powerMetrics")
-        if devMetrics:
-            mqttTopic = f"{topicPrefix}/{fromId}/device"
-            jsonObj = jsonObj | devMetrics
-        elif envMetrics:
-            mqttTopic = f"{topicPrefix}/{fromId}/environment"
-            jsonObj = jsonObj | envMetrics
-        elif powerMetrics:
-            mqttTopic = f"{topicPrefix}/{fromId}/power"
-            jsonObj = jsonObj | powerMetrics
-
-        mqtt.publish(
-            mqttTopic, json.dumps(jsonObj, separators=(",", ":")), qos=1
-        ).wait_for_publish(1)
-
-
-def onReceivePosition(packet, interface, topic=pub.AUTO_TOPIC):
-    """Callback invoked when a position packet arrives."""
+        # Metric groups with sensors, i.e. deviceMetrics published to the device topic
+        for group, stateTopic in _globals.getSensorRegistry().groups.items():
+            groupMetrics = telemetry.get(group)
+            if groupMetrics:
+                jsonObj = jsonObj | groupMetrics
+                break
+        else:
+            # No sensors for other telemetry types
+            return
+        # Announce auto discovery configuration only for sensors reported by the node,
+        # published only once or on change
+        if node.deviceConfigTopic is not None:
+            announceDevice(
+                node,
+                interface,
+                [
+                    (componentId, component)
+                    for prop, componentId, component in node.sensorComponents.get(
+                        stateTopic, ()
+                    )
+                    if prop in jsonObj
+                ],
+            )
+        for prop, mqttTopic, payload in node.sensorConfigs.get(stateTopic, ()):
+            if prop in jsonObj:
+                discovery.announcePayload(publisher, mqttTopic, payload)
+        tracer = _globals.getTracer()
+        tracer.stamp("discovery")
+
+        mqttTopic = node.stateTopics[stateTopic]
+        # Publish only changed values, unchanged ones are repeated after the heartbeat
+        if not _globals.getDeadband().submit(node, stateTopic, jsonObj):
+            return
+        # Rate limit per node and topic, merged messages are published by flushTelemetry
+        jsonObj = _globals.getCoalescer().submit(mqttTopic, stateTopic, jsonObj)
+        if jsonObj is not None:
+            payload = dumps(jsonObj)
+            tracer.stamp("serialize")
+            publisher.publish(mqttTopic, payload, qos=1)
+
+
+@timedHandler("position")
+def onReceivePosition(packet, interface, node):
+    """Handler invoked when a position packet arrives."""
     _globals = Globals.getInstance()
-    mqtt = _globals.getMQTT()
-    topicPrefix = _globals.getTopicPrefix()
+    publisher = _globals.getPublisher()
+    discovery = _globals.getDiscovery()
     jsonObj = {}
-    try:
-        fromId = packet.get("fromId")
-        shortName = interface.nodes.get(fromId).get("user").get("shortName")
-    except AttributeError:
-        fromId = packet.get("fromId")
-        print(f"Error shortname, id: {interface.nodes.get(fromId)}")
-        return
-    # Filter nodes
-    filterNodes = _globals.getFilterNodes()
-    if len(filterNodes) > 0:
-        try:
-            filterNodes.index(shortName)
-        except ValueError:
-            return
-    # No special characters allowed in config topic
-    pattern = _globals.getSpecialChars()
-    fromId = re.sub(pattern, '', fromId)
     # Publish auto discovery configuration for device tracker
-    mqttTopic = f"homeassistant/device_tracker/{fromId}/config"
-    jsonObj["name"] = f"{shortName} Position"
-    jsonObj["unique_id"] = f"{shortName.lower()}_position"
-    jsonObj["json_attributes_topic"] = f"{topicPrefix}/{fromId}/attributes"
-    jsonObj["source_type"] = "gps"
-    mqtt.publish(
-        mqttTopic, json.dumps(jsonObj, separators=(",", ":")), qos=1
-    ).wait_for_publish(1)
+    if node.deviceConfigTopic is not None:
+        announceDevice(node, interface, [node.trackerComponent])
+    else:
+        discovery.announcePayload(
+            publisher, node.trackerConfigTopic, node.trackerConfig
+        )
+    tracer = _globals.getTracer()
+    tracer.stamp("discovery")
     # Publish position payload for device tracker in attributes topic
-    jsonObj.clear()
     position = packet.get("decoded").get("position")
     if position:
-        jsonObj["longitude"] = position.get("longitude")
-        jsonObj["latitude"] = position.get("latitude")
+        positionFilter = _globals.getPositionFilter()
+        latitude = position.get("latitude")
+        longitude = position.get("longitude")
+        if latitude is not None and longitude is not None:
+            latitude, longitude = positionFilter.reduce(latitude, longitude)
+        # Publish only moved nodes, unmoved ones are repeated after the heartbeat
+        if not positionFilter.submit(node, latitude, longitude):
+            return
+        jsonObj["longitude"] = longitude
+        jsonObj["latitude"] = latitude
         jsonObj["satsInView"] = position.get("satsInView")
-        jsonObj["location_accuracy"] = 1
-        mqttTopic = f"{topicPrefix}/{fromId}/attributes"
-        mqtt.publish(
-            mqttTopic, json.dumps(jsonObj, separators=(",", ":")), qos=1
-        ).wait_for_publish(1)
+        jsonObj["location_accuracy"] = positionFilter.precision or 1
+        payload = dumps(jsonObj)
+        tracer.stamp("serialize")
+        publisher.publish(node.attributesTopic, payload, qos=1)
 
 
-def onReceiveText(packet, interface, topic=pub.AUTO_TOPIC):
-    """Callback invoked when a text packet arrives."""
+@timedHandler("text")
+def onReceiveText(packet, interface, node):
+    """Handler invoked when a text or detection sensor packet arrives."""
     try:
         _globals = Globals.getInstance()
-        mqtt = _globals.getMQTT()
-        channelList = _globals.getChannelList()
-        topicPrefix = _globals.getTopicPrefix()
+        publisher = _globals.getPublisher()
+        channelList = _globals.getRadio(interface).channelList
+        fromName = node.shortName
         jsonObj = {}
-        try:
-            fromName = (
-                interface.nodes.get(packet.get("fromId")).get("user").get("shortName")
-            )
-        except AttributeError:
-            fromId = packet.get("fromId")
-            print(f"Error shortname, id: {interface.nodes.get(fromId)}")
-            return
         if packet.get("channel"):
             channelNumber = packet["channel"]
         else:
             channelNumber = 0
-        # No special characters allowed in config topic
-        pattern = _globals.getSpecialChars()
-        channelName = re.sub(pattern, '', channelList[channelNumber])
-        # Publish auto discovery configuration for MQTT text entity per channel
-        mqttTopic = f"homeassistant/text/{channelName}/config"
-        jsonObj["name"] = f"{channelList[channelNumber]}"
-        jsonObj["unique_id"] = f"channel_{channelName.lower()}"
-        jsonObj["command_topic"] = f"{topicPrefix}/{channelName.lower()}/command"
-        jsonObj["state_topic"] = f"{topicPrefix}/{channelName.lower()}/state"
-        jsonObj["value_template"] = "{{ value_json.text }}"
-        jsonObj["mode"] = "text"
-        jsonObj["icon"] = "mdi:message-text"
-        mqtt.publish(
-            mqttTopic, json.dumps(jsonObj, separators=(",", ":")), qos=1
-        ).wait_for_publish(1)
+        # Announce auto discovery configuration for MQTT text entity per channel
+        channel = announceChannel(channelList[channelNumber])
+        tracer = _globals.getTracer()
+        tracer.stamp("discovery")
         # Publish received text in corresponding channel entity in attributes topic
-        jsonObj.clear()
         text = packet.get("decoded").get("text")
         if text:
             jsonObj["text"] = f"{fromName}: {text}"
-            mqttTopic = f"{topicPrefix}/{channelName.lower()}/state"
-            mqtt.publish(
-                mqttTopic, json.dumps(jsonObj, separators=(",", ":")), qos=1
-            ).wait_for_publish(1)
+            payload = dumps(jsonObj)
+            tracer.stamp("serialize")
+            publisher.publish(channel.stateTopic, payload, qos=1)
 
     except Exception as ex:
         print(f"Error processing text: {ex}")
 
 
+def saveSnapshot():
+    """Write the warm start snapshot when enabled"""
+    _globals = Globals.getInstance()
+    args = _globals.getArgs()
+    if not getattr(args, "snapshot", None):
+        return
+    try:
+        topicCache = _globals.getTopicCache()
+        now = time.time()
+        lastSeen = {fromId: now - age for fromId, age in topicCache.getAges().items()}
+        # Known nodes missing in the cache are evicted
+        nodes = {
+            fromId: {"shortName": shortName, "lastSeen": lastSeen[fromId]}
+            for fromId, shortName in _globals.getKnownNodes().items()
+            if fromId in lastSeen
+        }
+        for radio in _globals.getRadios():
+            for fromId, node in (getattr(radio.interface, "nodes", None) or {}).items():
+                shortName = (node.get("user") or {}).get("shortName")
+                if shortName is None:
+                    continue
+                seen = max(lastSeen.get(fromId, 0.0), float(node.get("lastHeard") or 0))
+                # Nodes not heard within the node ttl are expired
+                if now - seen < topicCache.ttl:
+                    nodes[fromId] = {"shortName": shortName, "lastSeen": seen}
+        writeSnapshot(
+            args.snapshot,
+            {radio.name: radio.channelList for radio in _globals.getRadios()},
+            nodes,
+            _globals.getDiscovery().export(),
+            _globals.getTopicCache().getOnline(),
+        )
+
+    except Exception as ex:
+        print(f"Error writing snapshot: {ex}")
+
+
+def loadSnapshot(radios):
+    """Restore channels, known nodes and discovery configs of the last run.
+
+    Returns True when a snapshot was loaded.
+    """
+    _globals = Globals.getInstance()
+    snapshot = readSnapshot(_globals.getArgs().snapshot)
+    if snapshot is None:
+        return False
+    for radio in radios:
+        radioSnapshot = snapshot["radios"].get(radio.name)
+        if radioSnapshot is not None:
+            radio.channelList = list(radioSnapshot.get("channels", []))
+    # Known nodes enter the node cache, their configs are forgotten on eviction.
+    # Nodes announced online by the last run go offline unless they are heard again.
+    topicCache = _globals.getTopicCache()
+    online = set(snapshot["online"])
+    now = time.time()
+    knownNodes = {}
+    expired = []
+    for fromId, node in sorted(
+        snapshot["nodes"].items(), key=lambda item: item[1]["lastSeen"]
+    ):
+        shortName = node["shortName"]
+        age = max(0.0, now - node["lastSeen"])
+        if age >= topicCache.ttl and fromId not in online:
+            # Expired meanwhile, nodes announced online go offline on the first expiry
+            expired.append((fromId, shortName))
+            continue
+        knownNodes[fromId] = shortName
+        topicCache.restoreNode(fromId, shortName, age).online = fromId in online
+    _globals.setKnownNodes(knownNodes)
+    discovery = _globals.getDiscovery()
+    discovery.restore(snapshot["discovery"])
+    removed = discovery.remove(
+        topic
+        for fromId, shortName in expired
+        for topic in topicCache.getConfigTopics(fromId, shortName)
+    )
+    print(
+        f"Snapshot: restored {len(knownNodes)} nodes and "
+        f"{len(snapshot['discovery']) - removed} discovery configs, "
+        f"skipped {len(expired)} expired nodes"
+    )
+    return True
+
+
+async def expireNodes():
+    """Announce nodes not heard for a while offline and evict them from the cache."""
+    try:
+        _globals = Globals.getInstance()
+        publisher = _globals.getPublisher()
+        offline, evicted = _globals.getTopicCache().expire(
+            float(_globals.getArgs().node_offline_after)
+        )
+        for node in offline:
+            if node.availabilityTopic is not None:
+                print(f"Node {node.fromId} ({node.shortName}) offline")
+                publisher.publish(
+                    node.availabilityTopic, b"offline", qos=1, retain=True
+                )
+        # Evicted nodes are announced again when heard, retained configs stay on broker
+        _globals.getDiscovery().remove(
+            topic for node in evicted for topic in node.getConfigTopics()
+        )
+        _globals.removeKnownNodes(node.fromId for node in evicted)
+
+    except Exception as ex:
+        print(f"Error expiring nodes: {ex}")
+
+
+async def periodicSnapshot():
+    """Write the warm start snapshot periodically."""
+    saveSnapshot()
+
+
 async def periodic(interval_sec, coro_name, *args, **kwargs):
     """Helper function for running a target periodically."""
     # Loop forever
@@ -234,61 +446,376 @@ async def periodic(interval_sec, coro_name, *args, **kwargs):
         await coro_name(*args, **kwargs)
 
 
-async def publishChannelConfig():
-    """Publish known channels in HA to keep them alive when no message are received over long time."""
+async def flushTelemetry():
+    """Publish merged telemetry messages whose minimum interval has expired."""
     try:
         _globals = Globals.getInstance()
-        mqtt = _globals.getMQTT()
-        channelList = _globals.getChannelList()
-        topicPrefix = _globals.getTopicPrefix()
+        publisher = _globals.getPublisher()
+        for mqttTopic, jsonObj in _globals.getCoalescer().flush():
+            publisher.publish(mqttTopic, dumps(jsonObj), qos=1)
+
+    except Exception as ex:
+        print(f"Error flushing telemetry: {ex}")
+
+
+def sendQueued():
+    """Send queued text messages to the mesh as far as the airtime budget allows."""
+    try:
+        for message in Globals.getInstance().getScheduler().poll():
+            # Forward message to channel
+            message.radio.interface.sendText(
+                message.getText(),
+                "^all",  # Broadcast
+                wantAck=False,
+                wantResponse=False,
+                channelIndex=message.channelIndex,
+                onResponse=None,
+            )
+
+    except Exception as ex:
+        print(f"Error sending text: {ex}")
+
+
+async def sendOutbound():
+    """Periodic task sending queued text messages to the mesh."""
+    sendQueued()
+
+
+async def drainSpool():
+    """Move messages spooled during a broker outage into the outbound queue."""
+    try:
+        _globals = Globals.getInstance()
+        args = _globals.getArgs()
+        _globals.getPublisher().drainSpool(int(args.spool_drain_rate))
+
+    except Exception as ex:
+        print(f"Error draining spool: {ex}")
+
+
+async def publishBridgeState():
+    """Publish the bridge metrics as Home Assistant sensors."""
+    try:
+        _globals = Globals.getInstance()
+        publisher = _globals.getPublisher()
+        discovery = _globals.getDiscovery()
+        stateTopic = f"{_globals.getTopicPrefix()}/bridge/state"
         jsonObj = {}
+        for name, (value, kind) in _globals.getMetrics().snapshot().items():
+            config = {}
+            config["name"] = f"Meshtastic2hass {name.replace('_', ' ').title()}"
+            config["unique_id"] = f"meshtastic2hass_{name}"
+            config["state_topic"] = stateTopic
+            config["state_class"] = (
+                "total_increasing" if kind == "counter" else "measurement"
+            )
+            config["platform"] = "mqtt"
+            config["value_template"] = "{{ value_json." + name + " }}"
+            configTopic = f"homeassistant/sensor/meshtastic2hass/{name}/config"
+            discovery.announce(publisher, configTopic, config)
+            jsonObj[name] = value
+        publisher.publish(stateTopic, dumps(jsonObj), qos=1)
+
+    except Exception as ex:
+        print(f"Error publishing bridge state: {ex}")
+
+
+async def startMetricsServer():
+    """Serve the bridge metrics via HTTP"""
+    _globals = Globals.getInstance()
+    args = _globals.getArgs()
+    try:
+        await _globals.getMetrics().serve(args.metrics_host, int(args.metrics_port))
+        print(
+            f"Metrics: serving on "
+            f"http://{args.metrics_host}:{args.metrics_port}/metrics"
+        )
+    except OSError as ex:
+        print(f"Metrics: unable to serve on port {args.metrics_port}: {ex}")
 
-        for channelName in channelList:
-            # No special characters allowed in config topic
-            pattern = _globals.getSpecialChars()
-            channelName = re.sub(pattern, '', channelName)
-            # Publish auto discovery configuration for MQTT text entity per channel
-            mqttTopic = f"homeassistant/text/{channelName}/config"
-            jsonObj["name"] = f"{channelName}"
-            jsonObj["unique_id"] = f"channel_{channelName.lower()}"
-            jsonObj["command_topic"] = f"{topicPrefix}/{channelName.lower()}/command"
-            jsonObj["state_topic"] = f"{topicPrefix}/{channelName.lower()}/state"
-            jsonObj["value_template"] = "{{ value_json.text }}"
-            jsonObj["mode"] = "text"
-            jsonObj["icon"] = "mdi:message-text"
-            mqtt.publish(
-                mqttTopic, json.dumps(jsonObj, separators=(",", ":")), qos=1
-            ).wait_for_publish(1)
+
+def initMetrics():
+    """Register the bridge metrics read from the pipeline stages"""
+    _globals = Globals.getInstance()
+    metrics = _globals.getMetrics()
+    metrics.addCallback(
+        "meshtastic2hass_mqtt_published_total",
+        "MQTT messages handed to the client.",
+        lambda: _globals.getPublisher().published,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_mqtt_acknowledged_total",
+        "MQTT messages acknowledged by the broker.",
+        lambda: _globals.getPublisher().acked,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_mqtt_dropped_total",
+        "MQTT messages dropped on outbound queue overflow.",
+        lambda: _globals.getPublisher().dropped,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_mqtt_failed_total",
+        "MQTT messages failed to publish.",
+        lambda: _globals.getPublisher().failed,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_mqtt_queue_depth",
+        "MQTT messages in the outbound queue.",
+        lambda: _globals.getPublisher().getQueueDepth(),
+    )
+    metrics.addCallback(
+        "meshtastic2hass_mqtt_inflight",
+        "MQTT messages waiting for broker acknowledge.",
+        lambda: _globals.getPublisher().getInflight(),
+    )
+    metrics.addCallback(
+        "meshtastic2hass_spool_depth",
+        "MQTT messages in the spool.",
+        lambda: len(_globals.getPublisher().spool or ()),
+    )
+    metrics.addCallback(
+        "meshtastic2hass_telemetry_pending",
+        "Topics with coalesced telemetry waiting for publish.",
+        lambda: _globals.getCoalescer().getPending(),
+    )
+    metrics.addCallback(
+        "meshtastic2hass_telemetry_coalesced_total",
+        "Telemetry messages merged by the rate limit.",
+        lambda: _globals.getCoalescer().coalesced,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_telemetry_suppressed_total",
+        "Telemetry messages not published since their values did not change.",
+        lambda: _globals.getDeadband().suppressed,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_position_suppressed_total",
+        "Position updates not published since the node did not move.",
+        lambda: _globals.getPositionFilter().suppressed,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_nodes",
+        "Nodes in the node cache.",
+        lambda: len(_globals.getTopicCache().nodes),
+    )
+    metrics.addCallback(
+        "meshtastic2hass_nodes_online",
+        "Nodes heard within the offline interval.",
+        lambda: len(_globals.getTopicCache().getOnline()),
+    )
+    metrics.addCallback(
+        "meshtastic2hass_pending_packets",
+        "Packets held until the node info of their sender arrives.",
+        lambda: _globals.getPendingPackets().getPending(),
+    )
+    metrics.addCallback(
+        "meshtastic2hass_pending_dropped_total",
+        "Held packets dropped on pending buffer overflow.",
+        lambda: _globals.getPendingPackets().dropped,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_outbound_sent_total",
+        "Text messages from MQTT sent to the mesh.",
+        lambda: _globals.getScheduler().sent,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_outbound_merged_total",
+        "Repeated identical text messages merged into a queued one.",
+        lambda: _globals.getScheduler().merged,
+        "counter",
+    )
+    metrics.addCallback(
+        "meshtastic2hass_outbound_queue_depth",
+        "Text messages waiting for airtime.",
+        lambda: _globals.getScheduler().getQueueDepth(),
+    )
+    _globals.getScheduler().setMetrics(metrics)
+    _globals.getPublisher().setMetrics(metrics)
+
+
+def announceChannel(channelName):
+    """Announce the MQTT text entity of a channel in HA, returns its cache entry."""
+    _globals = Globals.getInstance()
+    # Cached topics and payload, no special characters allowed in config topic
+    channel = _globals.getTopicCache().getChannel(channelName)
+    _globals.getDiscovery().announcePayload(
+        _globals.getPublisher(), channel.configTopic, channel.config
+    )
+    return channel
+
+
+# Portnum -> (handler, filtered by allow list), channel text ignores the allow list
+portnumHandlers = {
+    "TELEMETRY_APP": (onReceiveTelemetry, True),
+    "POSITION_APP": (onReceivePosition, True),
+    "TEXT_MESSAGE_APP": (onReceiveText, False),
+    # Forward notification from detection sensor as text message to HA
+    "DETECTION_SENSOR_APP": (onReceiveText, False),
+}
+
+
+def registerHandler(portnum, handler, applyAllowList=True):
+    """Register a handler for a portnum, replaces an existing handler.
+
+    The handler is invoked as handler(packet, interface, node) on the event loop
+    after duplicate suppression and node filter, node is the cached NodeEntry
+    of the sender with fromId, shortName, nodeId and its topics.
+    """
+    portnumHandlers[portnum] = (handler, applyAllowList)
+
+
+def loadHandler(spec):
+    """Load a handler function given as module:function, raises ValueError if invalid"""
+    moduleName, separator, functionName = str(spec).partition(":")
+    if not moduleName or not separator or not functionName:
+        raise ValueError(f"{spec} is not given as module:function")
+    try:
+        handler = getattr(importlib.import_module(moduleName), functionName)
+    except (ImportError, AttributeError) as ex:
+        raise ValueError(f"unable to load {spec}: {ex}")
+    if not callable(handler):
+        raise ValueError(f"{spec} is not a function")
+    return handler
+
+
+@pauseWhenFull
+@traceReceipt
+@onEventLoop
+@timedHandler("receive")
+def onReceive(packet, interface):
+    """Callback invoked when any packet arrives, dispatches it by portnum"""
+    try:
+        _globals = Globals.getInstance()
+        recorder = _globals.getRecorder()
+        if recorder is not None:
+            radio = _globals.getRadio(interface)
+            recorder.record(packet, interface, radio.name if radio else None)
+        portnum = packet.get("decoded", {}).get("portnum")
+        _globals.getMetrics().packetsReceived.inc(portnum or "ENCRYPTED")
+        if portnum == "NODEINFO_APP":
+            # The interface knows the node now, process its held packets
+            released = _globals.getPendingPackets().release(packet.get("fromId"))
+            dispatchHeld(released)
+        tracer = _globals.getTracer()
+        tracer.begin(packet)
+        try:
+            dispatchPacket(packet, interface)
+        finally:
+            tracer.end()
 
     except Exception as ex:
-        print(f"Error processing text: {ex}")
+        print(f"Error processing packet: {ex}")
+
+
+def dispatchPacket(packet, interface, shortName=None):
+    """Look up sender, filter and dispatch a packet to the handler of its portnum.
+
+    Packets of senders without node info are held until NODEINFO_APP arrives,
+    shortName is given for held packets which expired.
+    """
+    _globals = Globals.getInstance()
+    metrics = _globals.getMetrics()
+    portnum = packet.get("decoded", {}).get("portnum")
+    entry = portnumHandlers.get(portnum)
+    if entry is None:
+        return
+    handler, applyAllowList = entry
+    # Sender lookup, filter and duplicate check once per packet
+    fromId = packet.get("fromId")
+    if shortName is None:
+        shortName = getShortName(fromId, interface)
+    if shortName is None:
+        radio = _globals.getRadio(interface)
+        if _globals.getPendingPackets().hold(fromId, packet, radio):
+            print(f"Unknown node {fromId}, holding its packets until node info arrives")
+        return
+    nodeFilter = _globals.getNodeFilter()
+    if not nodeFilter.isForwarded(fromId, shortName, portnum, applyAllowList):
+        metrics.packetsDropped.inc("filtered")
+        return
+    if _globals.getSeenPackets().isDuplicate(packet, "receive"):
+        metrics.packetsDropped.inc("duplicate")
+        return
+    # Cached topics and payloads, no special characters in Hass config topic
+    topicCache = _globals.getTopicCache()
+    previous = topicCache.findNode(fromId)
+    node = topicCache.getNode(fromId, shortName)
+    if previous is not None and previous is not node:
+        # The short name changed, i.e. the node info of a node with fallback name
+        # arrived. The unique ids change, remove the entities of the previous name.
+        _globals.getDiscovery().retire(
+            _globals.getPublisher(), previous.getConfigTopics()
+        )
+    if not node.online:
+        node.online = True
+        if node.availabilityTopic is not None:
+            _globals.getPublisher().publish(
+                node.availabilityTopic, b"online", qos=1, retain=True
+            )
+    _globals.getTracer().stamp("filter")
+    handler(packet, interface, node)
+
 
+def dispatchHeld(packets, shortName=None):
+    """Dispatch held packets via the current interface of the radio they came from"""
+    metrics = Globals.getInstance().getMetrics()
+    for packet, radio in packets:
+        # The interface is replaced on reconnect, it is None while disconnected
+        interface = radio.interface if radio is not None else None
+        if interface is None:
+            metrics.packetsDropped.inc("radio_lost")
+            continue
+        dispatchPacket(packet, interface, shortName)
 
-def onReceive(packet, interface, topic=pub.AUTO_TOPIC):
-    """Callback invoked when any packet arrives"""
+
+async def expirePending():
+    """Process or drop held packets of nodes whose node info did not arrive in time."""
     try:
-        if (
-            "decoded" in packet
-            and packet["decoded"]["portnum"] == "DETECTION_SENSOR_APP"
-        ):
-            # Forward notification from detection sensor as text message to HA
-            onReceiveText(packet, interface)
+        _globals = Globals.getInstance()
+        fallbackName = _globals.getArgs().pending_fallback_name
+        for fromId, packets in _globals.getPendingPackets().expire():
+            if not fallbackName or not fromId:
+                print(f"Error shortname, id: {fromId}, dropped {len(packets)} packets")
+                _globals.getMetrics().packetsDropped.inc(
+                    "unknown_node", value=len(packets)
+                )
+                continue
+            # Meshtastic default short name is the last four digits of the node id
+            shortName = fallbackName.format(id=fromId, shortId=fromId[-4:])
+            # Later packets of the node are dispatched at once until node info arrives
+            _globals.addKnownNode(fromId, shortName)
+            dispatchHeld(packets, shortName)
 
     except Exception as ex:
-        print(f"Error processing text: {ex}")
+        print(f"Error expiring held packets: {ex}")
 
 
-def onConnect(interface, topic=pub.AUTO_TOPIC):
+@onEventLoop
+def onConnect(interface):
     """Callback invoked when we connect to a radio"""
-    print(f"Connection: {topic.getName()}")
+    print("Connection: meshtastic.connection.established")
 
 
-def onDisconnect(interface, topic=pub.AUTO_TOPIC):
+@onEventLoop
+def onDisconnect(interface):
     """Callback invoked when we disconnect from a radio"""
-    print(f"Lost connection: {topic.getName()}")
+    print("Lost connection: meshtastic.connection.lost")
     _globals = Globals.getInstance()
-    if _globals.getLoop() is not None:
-        _globals.getLoop().stop()
+    radio = _globals.getRadio(interface)
+    loop = _globals.getLoop()
+    # Interfaces closed on purpose or replaced by a reconnect are unknown here
+    if radio is None or radio.closing or radio.reconnecting or loop is None:
+        return
+    radio.reconnecting = True
+    loop.create_task(reconnectRadio(radio))
 
 
 def toCamelCase(string):
@@ -298,94 +825,176 @@ def toCamelCase(string):
     return camelCaseString
 
 
-def onConnected(interface):
+def subscribeHandlers():
+    """Subscribe the packet entry point once, it serves the packets of all radios"""
+    from pubsub import pub
+
+    pub.subscribe(onConnect, "meshtastic.connection.established")
+    pub.subscribe(onDisconnect, "meshtastic.connection.lost")
+    pub.subscribe(onReceive, "meshtastic.receive")
+
+
+def initRadio(radio):
+    """Register a connected radio, load its channel list and announce the channels"""
+    from meshtastic import config_pb2
+
+    _globals = Globals.getInstance()
+    interface = radio.interface
+    channelList = []
+    node = interface.getNode("^local")
+    deviceChannels = node.channels
+    for deviceChannel in deviceChannels:
+        if deviceChannel.role:
+            if deviceChannel.settings.name:
+                channelList.append(deviceChannel.settings.name)
+
+            else:
+                # If channel name is blank, use the modem preset
+                loraConfig = node.localConfig.lora
+                modemPresetEnum = loraConfig.modem_preset
+                modemPresetString = (
+                    config_pb2._CONFIG_LORACONFIG_MODEMPRESET.values_by_number[
+                        modemPresetEnum
+                    ].name
+                )
+                channelList.append(toCamelCase(modemPresetString))
+    radio.channelList = channelList
+    radio.setLoraConfig(node.localConfig.lora)
+    _globals.registerInterface(radio)
+    print(f"Radio {radio.name}: connected")
+    # Announce all known channels once, the retained configs keep them alive in HA
+    for channelName in channelList:
+        announceChannel(channelName)
+    recorder = _globals.getRecorder()
+    if recorder is not None:
+        recorder.writeHeader(channelList, radio.name)
+    # Reconcile the warm start snapshot with the downloaded channels and node DB
+    saveSnapshot()
+
+
+def onConnected(radio):
     """Callback invoked when we are connected to a radio"""
     try:
-        _globals = Globals.getInstance()
-        _globals.setMeshtasticInterface(interface)
-        print("Radio: connected")
-        pub.subscribe(onReceiveText, "meshtastic.receive.text")
-        pub.subscribe(onReceiveTelemetry, "meshtastic.receive.telemetry")
-        pub.subscribe(onReceivePosition, "meshtastic.receive.position")
-        pub.subscribe(onConnect, "meshtastic.connection.established")
-        pub.subscribe(onDisconnect, "meshtastic.connection.lost")
-        pub.subscribe(onReceive, "meshtastic.receive")
-
-        channelList = _globals.getChannelList()
-        node = interface.getNode("^local")
-        deviceChannels = node.channels
-        for deviceChannel in deviceChannels:
-            if deviceChannel.role:
-                if deviceChannel.settings.name:
-                    channelList.append(deviceChannel.settings.name)
-
-                else:
-                    # If channel name is blank, use the modem preset
-                    loraConfig = node.localConfig.lora
-                    modemPresetEnum = loraConfig.modem_preset
-                    modemPresetString = (
-                        config_pb2._CONFIG_LORACONFIG_MODEMPRESET.values_by_number[
-                            modemPresetEnum
-                        ].name
-                    )
-                    channelList.append(toCamelCase(modemPresetString))
+        initRadio(radio)
 
     except Exception as ex:
         print(f"Aborting due to: {ex}")
-        interface.close()
+        radio.close()
         sys.exit(1)
 
 
+async def reconnectRadio(radio, wait=True):
+    """Reconnect a lost radio with exponential backoff, caches and queues are kept.
+
+    Without wait the first attempt starts at once, i.e. on a warm start.
+    """
+    _globals = Globals.getInstance()
+    metrics = _globals.getMetrics()
+    profile = _globals.getStartupProfile()
+    loop = asyncio.get_running_loop()
+    link = f"radio_{radio.name}"
+    while not radio.closing:
+        # Close the lost interface, its reader thread may still be running
+        interface = radio.interface
+        if interface is not None:
+            _globals.unregisterInterface(interface)
+            radio.interface = None
+            try:
+                await loop.run_in_executor(None, interface.close)
+            except Exception:
+                pass
+        if wait:
+            delay = radio.backoff.next()
+            print(
+                f"Radio {radio.name}: reconnect attempt {radio.backoff.attempts} "
+                f"in {delay:.1f} s"
+            )
+            await asyncio.sleep(delay)
+        wait = True
+        try:
+            # Blocks until the node DB and config are downloaded
+            with profile.measure("radio connect"):
+                await loop.run_in_executor(None, radio.connect)
+            with profile.measure("node db sync"):
+                initRadio(radio)
+        except Exception as ex:
+            print(f"Radio {radio.name}: reconnect failed: {ex}")
+            metrics.reconnectAttempts.inc(link, "failure")
+            continue
+        metrics.reconnectAttempts.inc(link, "success")
+        print(
+            f"Radio {radio.name}: reconnected after {radio.backoff.attempts} attempts"
+        )
+        radio.backoff.reset()
+        break
+    radio.reconnecting = False
+    if not any(other.reconnecting for other in _globals.getRadios()):
+        # Startup of a warm start is complete once all radios are connected
+        profile.report()
+
+
+@onEventLoop
 def onMQTTMessage(mqttc, obj, msg):
     """Callback invoke when we receive a message via MQTT"""
+    from meshtastic import channel_pb2
+
     _globals = Globals.getInstance()
-    channelList = _globals.getChannelList()
     topicPrefix = _globals.getTopicPrefix()
-    interface = _globals.getMeshtasticInterface()
+    # Home Assistant birth message, replay all discovery configs
+    if msg.topic == _globals.getHassStatusTopic():
+        if msg.payload.decode("utf-8") == "online":
+            count = _globals.getDiscovery().replay(_globals.getPublisher())
+            print(f"MQTT: Home Assistant online, replayed {count} discovery configs")
+        return
     # Check for correct topic
     if msg.topic.startswith(topicPrefix):
         channel = msg.topic.split("/")[-1]
-        try:
+        # Forward via the first radio with this channel enabled
+        for radio in _globals.getRadios():
             # Check for existing channel
-            channel_index = channelList.index(channel)
-        except ValueError:
-            return
-        # Check for enabled channel
-        ch = interface.localNode.getChannelByChannelIndex(channel_index)
-        if (ch and ch.role != channel_pb2.Channel.Role.DISABLED):
-            # Forward message to channel
-            # print(channel + " " + " " + msg.payload.decode('utf-8'))
-            interface.sendText(
-                     msg.payload.decode('utf-8'),
-                     "^all",  # Broadcast
-                     wantAck=False,
-                     wantResponse=False,
-                     channelIndex=channel_index,
-                     onResponse=None,
-                 )
+            channel_index = radio.getChannelIndex(channel)
+            if channel_index is None or radio.interface is None:
+                continue
+            # Check for enabled channel
+            ch = radio.interface.localNode.getChannelByChannelIndex(channel_index)
+            if (ch and ch.role != channel_pb2.Channel.Role.DISABLED):
+                # Queue message for the channel, sent by sendOutbound within airtime
+                _globals.getScheduler().submit(
+                    radio, channel_index, channel, msg.payload.decode('utf-8')
+                )
+                return
 
 
 def onMQTTConnect(client, userdata, flags, reason_code, properties):
     """Callback invoke when we connect to MQTT broker"""
-    if reason_code != 0:
+    _globals = Globals.getInstance()
+    if reason_code == 0:
+        print("MQTT: connected")
+        # Subscriptions are lost with a clean session, subscribe on every connect
+        client.subscribe(
+            [(f"{_globals.getTopicPrefix()}/+", 0), (_globals.getHassStatusTopic(), 0)]
+        )
+        publisher = _globals.getPublisher()
+        # Send messages queued while disconnected, drainSpool drains spooled ones
+        publisher.setConnected(True)
+        # The broker may have lost retained discovery configs while we were disconnected
+        _globals.getDiscovery().replay(publisher)
+    else:
+        # The client keeps trying to reconnect, messages are spooled meanwhile
         print(f"MQTT: unexpected connection error {reason_code}")
-        _globals = Globals.getInstance()
-        if _globals.getLoop() is not None:
-            _globals.getLoop().stop()
 
 
 def onMQTTDisconnect(client, userdata, flags, reason_code, properties):
     """Callback invoke when we disconnect from MQTT broker"""
+    Globals.getInstance().getPublisher().setConnected(False)
     if reason_code != 0:
+        # The client reconnects automatically, messages are spooled meanwhile
         print(f"MQTT: unexpected disconnection error {reason_code}")
-        _globals = Globals.getInstance()
-        if _globals.getLoop() is not None:
-            _globals.getLoop().stop()
 
 
 def onMQTTPublish(client, userdata, mid, reason_codes, properties):
     """Callback invoked when a message has completed transmission to the broker"""
-    pass
+    Globals.getInstance().getPublisher().onAck(mid)
 
 
 def initArgParser():
@@ -437,6 +1046,13 @@ def initArgParser():
         required=False,
     )
 
+    parser.add_argument(
+        "--mqtt-client-id",
+        help="The MQTT client id, defaults to meshtastic2hass-<hostname>-<pid>.",
+        default=None,
+        required=False,
+    )
+
     parser.add_argument(
         "--use-network",
         help="Use network connection to Meshtastic interface instead of serial",
@@ -451,6 +1067,381 @@ def initArgParser():
         required=False,
     )
 
+    parser.add_argument(
+        "--mqtt-queue-size",
+        help="Maximum number of messages in the MQTT outbound queue.",
+        default=1000,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--mqtt-max-inflight",
+        help="Maximum number of MQTT messages waiting for broker acknowledge.",
+        default=20,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--mqtt-queue-overflow",
+        help=(
+            "Policy when the MQTT outbound queue is full, block pauses the radio "
+            "reception."
+        ),
+        choices=[publisher.DROP_OLDEST, publisher.BLOCK],
+        default=publisher.DROP_OLDEST,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--mqtt-device-discovery",
+        help=(
+            "Announce one Home Assistant device discovery config per node instead of "
+            "one per entity."
+        ),
+        action="store_true",
+        default=False,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--mqtt-blocking-publish",
+        help="Wait for each MQTT message to complete, for debugging only.",
+        action="store_true",
+        default=False,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--telemetry-min-interval",
+        help=(
+            "Minimum interval in seconds between telemetry messages per node and "
+            "topic."
+        ),
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--telemetry-heartbeat",
+        help=(
+            "Publish telemetry only on change, but at least every heartbeat seconds. 0 "
+            "publishes all."
+        ),
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--position-min-distance",
+        help=(
+            "Minimum movement in meters to publish a position before the heartbeat "
+            "interval."
+        ),
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--position-heartbeat",
+        help=(
+            "Publish positions only on movement, but at least every heartbeat seconds. "
+            "0 publishes all."
+        ),
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--position-distance",
+        help="Distance calculation of the movement.",
+        choices=["haversine", "equirectangular"],
+        default="haversine",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--position-precision",
+        help=(
+            "Round positions to a precision in meters, reported as location accuracy. "
+            "0 keeps them."
+        ),
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--node-max",
+        help=(
+            "Maximum number of nodes in the node cache, the node heard least recently "
+            "is evicted."
+        ),
+        default=10000,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--node-ttl",
+        help="Time in seconds a node not heard is kept in the node cache.",
+        default=604800,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--node-offline-after",
+        help=(
+            "Time in seconds after which a node not heard is announced offline. 0 "
+            "disables availability."
+        ),
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--dedup-capacity",
+        help=(
+            "Maximum number of remembered packets for duplicate suppression, 0 "
+            "disables."
+        ),
+        default=4096,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--dedup-ttl",
+        help="Time in seconds a packet is remembered for duplicate suppression.",
+        default=600,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--pending-per-node",
+        help="Maximum number of held packets per node without node info, 0 drops them.",
+        default=8,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--pending-max-nodes",
+        help="Maximum number of nodes without node info with held packets.",
+        default=256,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--pending-ttl",
+        help="Time in seconds packets are held until the node info arrives.",
+        default=600,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--pending-fallback-name",
+        help=(
+            "Short name of nodes whose node info did not arrive, i.e. {shortId} or "
+            "{id}. Empty drops."
+        ),
+        default="",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--spool",
+        help=(
+            "Path to spool database storing messages while the MQTT broker is "
+            "unavailable."
+        ),
+        default=None,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--spool-max-messages",
+        help="Maximum number of spooled messages.",
+        default=100000,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--spool-max-bytes",
+        help="Maximum total size of spooled messages in bytes.",
+        default=50000000,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--spool-max-age",
+        help="Maximum age of spooled messages in seconds.",
+        default=86400,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--spool-drain-rate",
+        help="Number of spooled messages per second sent after reconnect.",
+        default=50,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--outbound-queue-size",
+        help="Maximum number of text messages from MQTT waiting for airtime.",
+        default=50,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--outbound-airtime-share",
+        help=(
+            "Share of airtime per channel for text messages from MQTT, i.e. 0.05 for "
+            "5%%."
+        ),
+        default=0.05,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--outbound-burst",
+        help="Airtime in seconds a channel may use at once after an idle period.",
+        default=10,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--outbound-max-age",
+        help=(
+            "Time in seconds a text message from MQTT waits for airtime before it is "
+            "dropped."
+        ),
+        default=300,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--outbound-duplicates",
+        help="Rule for repeated identical text messages from MQTT.",
+        choices=["keep", "drop", "merge"],
+        default="merge",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--outbound-duplicate-window",
+        help="Time in seconds a sent text message counts as repeated.",
+        default=60,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--snapshot",
+        help="Path to a warm start snapshot of channels, nodes and discovery state.",
+        default=None,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--snapshot-interval",
+        help="Interval in seconds to write the warm start snapshot.",
+        default=300,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--trace-sample-rate",
+        help=(
+            "Share of received packets traced from receipt to broker acknowledge, i.e. "
+            "0.01 for 1%%."
+        ),
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--trace-capacity",
+        help="Number of packet traces kept in memory, printed on SIGUSR1.",
+        default=1000,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--trace-file",
+        help="Path to a rotating file the packet traces are written to as JSON lines.",
+        default=None,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--record",
+        help="Record all received packets into a compressed JSONL capture file.",
+        default=None,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--replay",
+        help="Replay packets from a capture file instead of connecting a radio.",
+        default=None,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--replay-realtime",
+        help=(
+            "Replay packets with their original timing instead of as fast as "
+            "possible."
+        ),
+        action="store_true",
+        default=False,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--replay-fake-mqtt",
+        help="Replay into an in-process fake MQTT client instead of the broker.",
+        action="store_true",
+        default=False,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        help="Port of the HTTP metrics endpoint, 0 disables the endpoint.",
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--metrics-host",
+        help="Host name or IP the HTTP metrics endpoint is bound to.",
+        default="127.0.0.1",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--metrics-hass-interval",
+        help="Interval in seconds to publish bridge metrics as HA sensors, 0 disables.",
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--check-config",
+        help="Validate the configuration file and exit.",
+        action="store_true",
+        default=False,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--startup-profile",
+        help=(
+            "Print the time spent in imports, config load, MQTT connect, radio connect "
+            "and node DB sync."
+        ),
+        action="store_true",
+        default=False,
+        required=False,
+    )
+
     parser.set_defaults(deprecated=None)
     parser.add_argument("--version", action="version", version=f"{__version__}")
 
@@ -459,41 +1450,246 @@ def initArgParser():
     _globals.setParser(parser)
 
 
+def initPublisher(mqtt):
+    """Initialize the MQTT publisher for a client"""
+    _globals = Globals.getInstance()
+    args = _globals.getArgs()
+    _publisher = publisher.Publisher(
+        queueSize=int(args.mqtt_queue_size),
+        maxInflight=int(args.mqtt_max_inflight),
+        overflow=args.mqtt_queue_overflow,
+        blocking=args.mqtt_blocking_publish,
+    )
+    _publisher.setClient(mqtt)
+    _publisher.setTracer(_globals.getTracer())
+    _globals.setPublisher(_publisher)
+    return _publisher
+
+
 def initMQTT():
     """Initialize the MQTT client and connect to broker"""
+    import paho.mqtt.client as mqttClient
+
+    from .mqttloop import MQTTLoop
+
     _globals = Globals.getInstance()
     args = _globals.getArgs()
     mqtt = _globals.getMQTT()
-    client_id = f'meshtastic2hass-{random.randint(0, 100)}'
+    # Unique per host and process, the broker disconnects clients with the same id
+    client_id = (
+        args.mqtt_client_id
+        or f"meshtastic2hass-{socket.gethostname()}-{os.getpid()}"
+    )
     try:
         mqtt = mqttClient.Client(mqttClient.CallbackAPIVersion.VERSION2, client_id, True)
         _globals.setMQTT(mqtt)
+        initPublisher(mqtt)
         _globals.setTopicPrefix(args.mqtt_topic_prefix)
         mqtt.on_message = onMQTTMessage
         mqtt.on_connect = onMQTTConnect
         mqtt.on_disconnect = onMQTTDisconnect
         mqtt.on_publish = onMQTTPublish
         mqtt.username_pw_set(args.mqtt_user, args.mqtt_password)
-        mqtt.connect(args.mqtt_host, int(args.mqtt_port))
-        mqtt.subscribe([(f"{args.mqtt_topic_prefix}/+", 0)])
-        mqtt.loop_start()
+        if args.spool:
+            _globals.getPublisher().setSpool(
+                Spool(
+                    args.spool,
+                    maxMessages=int(args.spool_max_messages),
+                    maxBytes=int(args.spool_max_bytes),
+                    maxAge=float(args.spool_max_age),
+                )
+            )
+        loop = _globals.getLoop()
+        if loop is not None and not args.mqtt_blocking_publish:
+            # MQTT I/O and callbacks run on the event loop with the packet handlers
+            mqttLoop = MQTTLoop(loop, mqtt, minDelay=1, maxDelay=120)
+            mqttLoop.setMetrics(_globals.getMetrics())
+            _globals.setMQTTLoop(mqttLoop)
+            _globals.getPublisher().setNetworkThread(threading.current_thread())
+            mqttLoop.connect(args.mqtt_host, int(args.mqtt_port))
+        else:
+            # Blocking publish waits for acknowledges, it needs the paho network thread
+            mqtt.reconnect_delay_set(min_delay=1, max_delay=120)
+            mqtt.connect(args.mqtt_host, int(args.mqtt_port))
+            mqtt.loop_start()
     except Exception as e:
         print(f"MQTT client error: {e}")
         sys.exit(1)
 
 
+def readConfig(path):
+    """Read the TOML configuration file, with the stdlib parser when available"""
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        from tomlkit import toml_file
+
+        return toml_file.TOMLFile(path).read()
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def importLibraries():
+    """Import the radio, MQTT and pubsub libraries, deferred until the bridge starts.
+
+    The handlers import them on first use, importing them here up front shows
+    their time in the startup profile instead of the first MQTT or radio connect.
+    """
+    import meshtastic.serial_interface  # noqa: F401
+    import meshtastic.tcp_interface  # noqa: F401
+    import paho.mqtt.client  # noqa: F401
+    import pubsub.pub  # noqa: F401
+
+
+def runReplay():
+    """Feed packets of a capture file through the handlers and report the throughput"""
+    _globals = Globals.getInstance()
+    args = _globals.getArgs()
+
+    def getInterface(name):
+        """Get the fake interface of a recorded radio, created on first use"""
+        name = name or "replay"
+        for radio in _globals.getRadios():
+            if radio.name == name:
+                return radio.interface
+        radio = RadioContext(name)
+        radio.interface = capture.FakeInterface()
+        _globals.addRadio(radio)
+        return radio.interface
+
+    if args.replay_fake_mqtt:
+        mqtt = capture.FakeMQTTClient()
+        mqtt.on_publish = onMQTTPublish
+        _globals.setMQTT(mqtt)
+        _globals.setTopicPrefix(args.mqtt_topic_prefix)
+        initPublisher(mqtt).setConnected(True)
+    else:
+        initMQTT()
+        # Wait for the broker connection
+        deadline = time.monotonic() + 10
+        while not _globals.getPublisher().connected and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def onHeader(header):
+        channelList = _globals.getRadio(getInterface(header.get("radio"))).channelList
+        channelList.clear()
+        channelList.extend(header.get("channels", []))
+
+    handlers = {None: [onReceive]}
+    report = capture.replay(
+        args.replay,
+        handlers,
+        getInterface,
+        realtime=args.replay_realtime,
+        onHeader=onHeader,
+    )
+    # Wait until the broker acknowledged all messages
+    _publisher = _globals.getPublisher()
+    deadline = time.monotonic() + 10
+    while (
+        _publisher.getQueueDepth() or _publisher.getInflight()
+    ) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    capture.printReport(report)
+    print(
+        f"MQTT: {_publisher.published} published, {_publisher.acked} acknowledged, "
+        f"{_publisher.dropped} dropped, {_publisher.failed} failed"
+    )
+    if not args.replay_fake_mqtt:
+        _globals.getMQTT().disconnect()
+        _globals.getMQTT().loop_stop()
+    return report
+
+
+async def shutdown():
+    """Close the radios, deliver or spool the queued messages and stop the loop"""
+    _globals = Globals.getInstance()
+    loop = asyncio.get_running_loop()
+    _publisher = _globals.getPublisher()
+    # Radio readers waiting for room with the block policy must not hold up close
+    _publisher.setClosing(True)
+    recorder = _globals.getRecorder()
+    if recorder is not None:
+        recorder.close()
+    saveSnapshot()
+    for radio in _globals.getRadios():
+        radio.closing = True
+        await loop.run_in_executor(None, radio.close)
+    # Give the broker a moment to take the queued messages
+    deadline = time.monotonic() + 5
+    while (
+        _publisher.connected
+        and (_publisher.getQueueDepth() or _publisher.getInflight())
+        and time.monotonic() < deadline
+    ):
+        await asyncio.sleep(0.05)
+    spooled = _publisher.close()
+    if spooled:
+        print(f"MQTT: spooled {spooled} queued messages")
+    lost = len(_publisher.queue)
+    if lost:
+        print(f"MQTT: {lost} queued messages lost on shutdown")
+    mqttLoop = _globals.getMQTTLoop()
+    mqtt = _globals.getMQTT()
+    if mqttLoop is not None:
+        mqttLoop.stop()
+        # The event loop writes the DISCONNECT, then paho closes the socket
+        deadline = time.monotonic() + 2
+        while mqtt.socket() is not None and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+    elif mqtt is not None:
+        mqtt.disconnect()
+        await loop.run_in_executor(None, mqtt.loop_stop)
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    loop.stop()
+
+
 def main():
     """Main program function"""
 
     def signal_handler(signal, frame):
-        client.close()
-        mqtt.disconnect()
-        mqtt.loop_stop()
+        nonlocal stopping
+        loop = _globals.getLoop()
+        if not stopping and loop is not None and loop.is_running():
+            # Shut down on the event loop, it flushes the MQTT client
+            stopping = True
+            loop.call_soon_threadsafe(loop.create_task, shutdown())
+            return
+        # Not running the event loop yet or signalled again, exit at once
+        recorder = _globals.getRecorder()
+        if recorder is not None:
+            recorder.close()
+        saveSnapshot()
+        for radio in _globals.getRadios():
+            radio.closing = True
+            radio.close()
+        mqttLoop = _globals.getMQTTLoop()
+        mqtt = _globals.getMQTT()
+        if mqttLoop is not None:
+            mqttLoop.stop()
+        elif mqtt is not None:
+            mqtt.disconnect()
+            mqtt.loop_stop()
+        _publisher = _globals.getPublisher()
+        if _publisher is not None:
+            _publisher.close()
         sys.exit(0)
 
+    stopping = False
+
+    def dump_traces(signal, frame):
+        traces = _globals.getTracer().dump()
+        print(traces if traces else "Tracing: no traces recorded")
+
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGABRT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    if hasattr(signal, "SIGUSR1"):
+        # Print the latency traces of sampled packets
+        signal.signal(signal.SIGUSR1, dump_traces)
 
     _globals = Globals.getInstance()
     parser = argparse.ArgumentParser(
@@ -504,63 +1700,326 @@ def main():
     _globals.setParser(parser)
     initArgParser()
     args = _globals.getArgs()
-    mqtt = _globals.getMQTT()
+    profile = StartupProfile(args.startup_profile)
+    _globals.setStartupProfile(profile)
     cfg = None
+    topicIntervals = {}
+    deadbands = {}
+    interfacesCfg = []
+    outboundCfg = {}
+    tracingCfg = {}
+
+    with profile.measure("config load"):
+        if len(sys.argv) == 1:
+            parser.print_help(sys.stderr)
+            sys.exit(1)
 
-    if len(sys.argv) == 1:
-        parser.print_help(sys.stderr)
-        sys.exit(1)
+        elif args.config is not None:
+            if os.path.exists(args.config):
+                try:
+                    cfg = readConfig(args.config)
+                except ValueError as ex:
+                    print(f"Error: invalid configuration file {args.config}: {ex}")
+                    sys.exit(1)
+                args.dev = cfg.get("device")
+                args.mqtt_topic_prefix = cfg.get("mqtt").get(
+                    "topic_prefix", args.mqtt_topic_prefix
+                )
+                args.mqtt_user = cfg.get("mqtt").get("user")
+                args.mqtt_password = cfg.get("mqtt").get("password")
+                args.mqtt_host = cfg.get("mqtt").get("host")
+                args.mqtt_port = cfg.get("mqtt").get("port")
+                args.mqtt_client_id = cfg.get("mqtt").get(
+                    "client_id", args.mqtt_client_id
+                )
+                args.mqtt_queue_size = cfg.get("mqtt").get(
+                    "queue_size", args.mqtt_queue_size
+                )
+                args.mqtt_max_inflight = cfg.get("mqtt").get(
+                    "max_inflight", args.mqtt_max_inflight
+                )
+                args.mqtt_queue_overflow = cfg.get("mqtt").get(
+                    "queue_overflow", args.mqtt_queue_overflow
+                )
+                args.mqtt_device_discovery = cfg.get("mqtt").get(
+                    "device_discovery", args.mqtt_device_discovery
+                )
+                args.use_network = cfg.get("use_network")
+                args.hostname = cfg.get("hostname")
+                interfacesCfg = cfg.get("interfaces", [])
+                try:
+                    _globals.setNodeFilter(
+                        NodeFilter(
+                            cfg.get("meshtastic").get("filter_nodes", []),
+                            cfg.get("meshtastic").get("deny_nodes", []),
+                            cfg.get("meshtastic").get("node_portnums", {}),
+                        )
+                    )
+                except ValueError as ex:
+                    print(f"Error: invalid node filter in {args.config}: {ex}")
+                    sys.exit(1)
+                args.dedup_capacity = cfg.get("meshtastic").get(
+                    "dedup_capacity", args.dedup_capacity
+                )
+                args.dedup_ttl = cfg.get("meshtastic").get("dedup_ttl", args.dedup_ttl)
+                args.pending_per_node = cfg.get("meshtastic").get(
+                    "pending_per_node", args.pending_per_node
+                )
+                args.pending_max_nodes = cfg.get("meshtastic").get(
+                    "pending_max_nodes", args.pending_max_nodes
+                )
+                args.pending_ttl = cfg.get("meshtastic").get(
+                    "pending_ttl", args.pending_ttl
+                )
+                args.pending_fallback_name = cfg.get("meshtastic").get(
+                    "pending_fallback_name", args.pending_fallback_name
+                )
+                spoolCfg = cfg.get("spool", {})
+                args.spool = spoolCfg.get("path", args.spool) or None
+                args.spool_max_messages = spoolCfg.get(
+                    "max_messages", args.spool_max_messages
+                )
+                args.spool_max_bytes = spoolCfg.get("max_bytes", args.spool_max_bytes)
+                args.spool_max_age = spoolCfg.get("max_age", args.spool_max_age)
+                args.spool_drain_rate = spoolCfg.get(
+                    "drain_rate", args.spool_drain_rate
+                )
+                nodesCfg = cfg.get("nodes", {})
+                args.node_max = nodesCfg.get("max_nodes", args.node_max)
+                args.node_ttl = nodesCfg.get("ttl", args.node_ttl)
+                args.node_offline_after = nodesCfg.get(
+                    "offline_after", args.node_offline_after
+                )
+                positionCfg = cfg.get("position", {})
+                args.position_min_distance = positionCfg.get(
+                    "min_distance", args.position_min_distance
+                )
+                args.position_heartbeat = positionCfg.get(
+                    "heartbeat", args.position_heartbeat
+                )
+                args.position_distance = positionCfg.get(
+                    "distance", args.position_distance
+                )
+                args.position_precision = positionCfg.get(
+                    "precision", args.position_precision
+                )
+                tracingCfg = cfg.get("tracing", {})
+                args.trace_sample_rate = tracingCfg.get(
+                    "sample_rate", args.trace_sample_rate
+                )
+                args.trace_capacity = tracingCfg.get("capacity", args.trace_capacity)
+                args.trace_file = tracingCfg.get("path", args.trace_file) or None
+                outboundCfg = cfg.get("outbound", {})
+                args.outbound_queue_size = outboundCfg.get(
+                    "queue_size", args.outbound_queue_size
+                )
+                args.outbound_airtime_share = outboundCfg.get(
+                    "airtime_share", args.outbound_airtime_share
+                )
+                args.outbound_burst = outboundCfg.get("burst", args.outbound_burst)
+                args.outbound_max_age = outboundCfg.get(
+                    "max_age", args.outbound_max_age
+                )
+                args.outbound_duplicates = outboundCfg.get(
+                    "duplicates", args.outbound_duplicates
+                )
+                args.outbound_duplicate_window = outboundCfg.get(
+                    "duplicate_window", args.outbound_duplicate_window
+                )
+                snapshotCfg = cfg.get("snapshot", {})
+                args.snapshot = snapshotCfg.get("path", args.snapshot) or None
+                args.snapshot_interval = snapshotCfg.get(
+                    "interval", args.snapshot_interval
+                )
+                metricsCfg = cfg.get("metrics", {})
+                args.metrics_port = metricsCfg.get("port", args.metrics_port)
+                args.metrics_host = metricsCfg.get("host", args.metrics_host)
+                args.metrics_hass_interval = metricsCfg.get(
+                    "hass_interval", args.metrics_hass_interval
+                )
+                telemetryCfg = cfg.get("telemetry", {})
+                args.telemetry_min_interval = telemetryCfg.get(
+                    "min_interval", args.telemetry_min_interval
+                )
+                topicIntervals = telemetryCfg.get("topic_min_interval", {})
+                args.telemetry_heartbeat = telemetryCfg.get(
+                    "heartbeat", args.telemetry_heartbeat
+                )
+                deadbands = telemetryCfg.get("deadband", {})
+                try:
+                    _globals.setSensorRegistry(compileSensors(cfg.get("sensors", [])))
+                except ValueError as ex:
+                    print(f"Error: invalid sensor in {args.config}: {ex}")
+                    sys.exit(1)
+                for portnum, spec in cfg.get("handlers", {}).items():
+                    try:
+                        registerHandler(portnum, loadHandler(spec))
+                    except ValueError as ex:
+                        print(
+                            f"Error: invalid handler {portnum} in {args.config}: {ex}"
+                        )
+                        sys.exit(1)
+            else:
+                print(f"Error: configuration file {args.config} not found!")
+                sys.exit(1)
+
+        _globals.setCoalescer(
+            Coalescer(float(args.telemetry_min_interval), dict(topicIntervals))
+        )
+        _globals.setTracer(
+            Tracer(
+                float(args.trace_sample_rate),
+                int(args.trace_capacity),
+                args.trace_file,
+                int(tracingCfg.get("max_bytes", 1000000)),
+                int(tracingCfg.get("backups", 3)),
+            )
+        )
+        _globals.setPositionFilter(
+            PositionFilter(
+                float(args.position_min_distance),
+                float(args.position_heartbeat),
+                args.position_distance,
+                float(args.position_precision),
+            )
+        )
+        _globals.setDeadband(
+            Deadband(
+                _globals.getSensorsByTopic(),
+                float(args.telemetry_heartbeat),
+                dict(deadbands),
+            )
+        )
+        _globals.setSeenPackets(
+            SeenPackets(int(args.dedup_capacity), float(args.dedup_ttl))
+        )
+        # Before the snapshot restores node state, a new prefix invalidates the cache
+        _globals.setTopicPrefix(args.mqtt_topic_prefix)
+        _globals.setDeviceDiscovery(args.mqtt_device_discovery)
+        _globals.setAvailability(float(args.node_offline_after) > 0)
+        _globals.setNodeLimits(int(args.node_max), float(args.node_ttl))
+        _globals.setScheduler(
+            OutboundScheduler(
+                queueSize=int(args.outbound_queue_size),
+                airtimeShare=float(args.outbound_airtime_share),
+                burst=float(args.outbound_burst),
+                maxAge=float(args.outbound_max_age),
+                duplicates=args.outbound_duplicates,
+                duplicateWindow=float(args.outbound_duplicate_window),
+                maxChannelUtilization=float(
+                    outboundCfg.get("max_channel_utilization", 25)
+                ),
+                maxAirUtilTx=float(outboundCfg.get("max_air_util_tx", 10)),
+                channelPriorities=dict(outboundCfg.get("priority", {})),
+            )
+        )
+        _globals.setPendingPackets(
+            PendingPackets(
+                int(args.pending_per_node),
+                int(args.pending_max_nodes),
+                float(args.pending_ttl),
+            )
+        )
 
-    elif args.config is not None:
-        if os.path.exists:
-            cfg = toml_file.TOMLFile(args.config).read()
-            args.dev = cfg.get("device")
-            _globals.setTopicPrefix(cfg.get("mqtt").get("topic_prefix"))
-            args.mqtt_user = cfg.get("mqtt").get("user")
-            args.mqtt_password = cfg.get("mqtt").get("password")
-            args.mqtt_host = cfg.get("mqtt").get("host")
-            args.mqtt_port = cfg.get("mqtt").get("port")
-            args.use_network = cfg.get("use_network")
-            args.hostname = cfg.get("hostname")
-            _globals.setFilterNodes(cfg.get("meshtastic").get("filter_nodes"))
-        else:
-            print(f"Error: configuration file {args.config} not found!")
-            sys.exit(1)
+    if args.check_config:
+        print(f"Configuration {args.config or 'from command line'} is valid")
+        sys.exit(0)
 
-    initMQTT()
-    try:
-        if args.use_network and isinstance(args.hostname, str):
-            client = meshtastic.tcp_interface.TCPInterface(args.hostname , noProto=False)
-        else:
-            client = meshtastic.serial_interface.SerialInterface(
-                devPath=args.dev, noProto=False
+    if args.replay:
+        runReplay()
+        sys.exit(0)
+
+    with profile.measure("imports"):
+        importLibraries()
+
+    if args.record:
+        _globals.setRecorder(capture.Recorder(args.record))
+
+    if interfacesCfg:
+        radios = [
+            RadioContext(
+                radioCfg.get("name", f"radio{index}"),
+                device=radioCfg.get("device"),
+                useNetwork=radioCfg.get("use_network", False),
+                hostname=radioCfg.get("hostname"),
             )
-    except PermissionError as ex:
-        username = os.getlogin()
-        message = "Permission Error:\n"
-        message += "  Need to add yourself to the 'dialout' group by running:\n"
-        message += f"     sudo usermod -a -G dialout {username}\n"
-        message += "  After running that command, log out and re-login for it to take effect.\n"
-        message += f"Error was:{ex}"
-        print(message)
-        sys.exit(1)
-    except FileNotFoundError as e:
-        print("Serial interface not found.")
-        print(f"Error was: {e}")
-        sys.exit(1)
-    except OSError as e:
-        print("Network interface not found.")
-        print(f"Error was: {e}")
-        sys.exit(1)
+            for index, radioCfg in enumerate(interfacesCfg)
+        ]
+    else:
+        radios = [
+            RadioContext(
+                "radio0",
+                device=args.dev,
+                useNetwork=args.use_network,
+                hostname=args.hostname,
+            )
+        ]
 
-    # We assume client is fully connected now
-    onConnected(client)
-    # Wait for packets
+    # One event loop runs the packet handlers, MQTT I/O and periodic tasks
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     _globals.setLoop(loop)
-    # Publish channel configuration every hour via MQTT to avoid unavailability in HA
-    loop.create_task(periodic(3600, publishChannelConfig))
+    with profile.measure("snapshot load"):
+        warmStart = bool(args.snapshot) and loadSnapshot(radios)
+    with profile.measure("mqtt connect"):
+        initMQTT()
+    initMetrics()
+    for radio in radios:
+        _globals.addRadio(radio)
+        if warmStart:
+            # Serve MQTT and discovery from the snapshot, the radio connects meanwhile
+            radio.reconnecting = True
+            loop.create_task(reconnectRadio(radio, wait=False))
+            continue
+        try:
+            with profile.measure("radio connect"):
+                radio.connect()
+        except PermissionError as ex:
+            username = os.getlogin()
+            message = "Permission Error:\n"
+            message += "  Need to add yourself to the 'dialout' group by running:\n"
+            message += f"     sudo usermod -a -G dialout {username}\n"
+            message += "  After running that command, log out and re-login for it to take effect.\n"
+            message += f"Error was:{ex}"
+            print(message)
+            sys.exit(1)
+        except FileNotFoundError as e:
+            print(f"Serial interface of radio {radio.name} not found.")
+            print(f"Error was: {e}")
+            sys.exit(1)
+        except OSError as e:
+            print(f"Network interface of radio {radio.name} not found.")
+            print(f"Error was: {e}")
+            sys.exit(1)
+
+        # We assume the radio is fully connected now
+        with profile.measure("node db sync"):
+            onConnected(radio)
+    subscribeHandlers()
+    # Publish merged telemetry messages once their minimum interval has expired
+    loop.create_task(periodic(1, flushTelemetry))
+    # Process or drop held packets of nodes whose node info did not arrive
+    loop.create_task(periodic(1, expirePending))
+    # Announce silent nodes offline and bound the node cache
+    loop.create_task(periodic(10, expireNodes))
+    # Send text messages from MQTT to the mesh within the airtime budget
+    loop.create_task(periodic(0.25, sendOutbound))
+    if args.spool:
+        # Drain messages spooled during a broker outage at a limited rate
+        loop.create_task(periodic(1, drainSpool))
+    if args.snapshot:
+        loop.create_task(periodic(float(args.snapshot_interval), periodicSnapshot))
+    if int(args.metrics_port) > 0:
+        loop.create_task(startMetricsServer())
+    if float(args.metrics_hass_interval) > 0:
+        # Publish the bridge metrics as sensors of the bridge itself
+        loop.create_task(
+            periodic(float(args.metrics_hass_interval), publishBridgeState)
+        )
+    if not warmStart:
+        # On a warm start the radios connect in the background, reconnectRadio reports
+        profile.report()
+    # Wait for packets
     try:
         loop.run_forever()
     finally:
@@ -0,0 +1,290 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import asyncio
+import bisect
+import threading
+import time
+
+# Default histogram buckets in seconds
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5,
+)
+
+
+def _escape(value):
+    """Escape a label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatLabels(labelNames, labelValues, extra=None):
+    """Format labels in Prometheus text exposition format"""
+    pairs = list(zip(labelNames, labelValues))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _formatValue(value):
+    """Format a sample value"""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelNames=()):
+        """Constructor for the Counter class"""
+        self.name = name
+        self.help = help
+        self.labelNames = tuple(labelNames)
+        self.lock = threading.Lock()
+        # Label values -> count
+        self.values = {}
+
+    def inc(self, *labelValues, value=1):
+        """Increment the counter of the given label values"""
+        with self.lock:
+            self.values[labelValues] = self.values.get(labelValues, 0) + value
+
+    def get(self, *labelValues):
+        """Get the count of the given label values"""
+        return self.values.get(labelValues, 0)
+
+    def total(self):
+        """Get the sum over all label values"""
+        with self.lock:
+            return sum(self.values.values())
+
+    def samples(self):
+        """Get the samples as list of (suffix, labels, value)"""
+        with self.lock:
+            return [
+                ("", _formatLabels(self.labelNames, k), v)
+                for k, v in self.values.items()
+            ]
+
+
+class Callback:
+    """Counter or gauge whose value is read from a function when rendered."""
+
+    def __init__(self, name, help, function, kind="gauge"):
+        """Constructor for the Callback class"""
+        self.name = name
+        self.help = help
+        self.function = function
+        self.kind = kind
+
+    def get(self):
+        """Get the current value"""
+        try:
+            return self.function()
+        except Exception:
+            return 0
+
+    def samples(self):
+        """Get the samples as list of (suffix, labels, value)"""
+        return [("", "", self.get())]
+
+
+class Histogram:
+    """Histogram with fixed buckets and optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelNames=(), buckets=DEFAULT_BUCKETS):
+        """Constructor for the Histogram class"""
+        self.name = name
+        self.help = help
+        self.labelNames = tuple(labelNames)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        # Label values -> [bucket counts..., count, sum]
+        self.values = {}
+
+    def observe(self, value, *labelValues):
+        """Add an observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            data = self.values.get(labelValues)
+            if data is None:
+                data = self.values[labelValues] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                data[index] += 1
+            data[-2] += 1
+            data[-1] += value
+
+    def samples(self):
+        """Get the samples as list of (suffix, labels, value)"""
+        samples = []
+        with self.lock:
+            for labelValues, data in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, data):
+                    cumulative += count
+                    labels = _formatLabels(
+                        self.labelNames, labelValues, ("le", _formatValue(bound))
+                    )
+                    samples.append(("_bucket", labels, cumulative))
+                labels = _formatLabels(self.labelNames, labelValues, ("le", "+Inf"))
+                samples.append(("_bucket", labels, data[-2]))
+                labels = _formatLabels(self.labelNames, labelValues)
+                samples.append(("_count", labels, data[-2]))
+                samples.append(("_sum", labels, data[-1]))
+        return samples
+
+
+class Registry:
+    """Collection of metrics rendered in Prometheus text exposition format."""
+
+    def __init__(self):
+        """Constructor for the Registry class"""
+        self.metrics = []
+
+    def register(self, metric):
+        """Add a metric, returns the metric"""
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Render all metrics"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{labels} {_formatValue(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class BridgeMetrics:
+    """Metrics of the Meshtastic to Home Assistant bridge."""
+
+    def __init__(self):
+        """Constructor for the BridgeMetrics class"""
+        self.registry = Registry()
+        self.startTime = time.time()
+        self.packetsReceived = self.registry.register(
+            Counter(
+                "meshtastic2hass_packets_received_total",
+                "Mesh packets received by portnum.",
+                ("portnum",),
+            )
+        )
+        self.packetsDropped = self.registry.register(
+            Counter(
+                "meshtastic2hass_packets_dropped_total",
+                "Mesh packets dropped by reason.",
+                ("reason",),
+            )
+        )
+        self.reconnectAttempts = self.registry.register(
+            Counter(
+                "meshtastic2hass_reconnect_attempts_total",
+                "Reconnect attempts of radios and MQTT broker by link and result.",
+                ("link", "result"),
+            )
+        )
+        self.outboundRejected = self.registry.register(
+            Counter(
+                "meshtastic2hass_outbound_rejected_total",
+                "Text messages from MQTT to the mesh rejected by reason.",
+                ("reason",),
+            )
+        )
+        self.handlerTime = self.registry.register(
+            Histogram(
+                "meshtastic2hass_handler_seconds",
+                "Time spent in packet handlers.",
+                ("handler",),
+            )
+        )
+        self.ackLatency = self.registry.register(
+            Histogram(
+                "meshtastic2hass_mqtt_ack_latency_seconds",
+                "Time from MQTT publish to broker acknowledge.",
+                buckets=(
+                    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                    2.5, 5.0, 10.0,
+                ),
+            )
+        )
+        self.registry.register(
+            Callback(
+                "meshtastic2hass_uptime_seconds",
+                "Time since start of the bridge.",
+                lambda: round(time.time() - self.startTime, 3),
+            )
+        )
+
+    def addCallback(self, name, help, function, kind="gauge"):
+        """Add a counter or gauge read from a function"""
+        return self.registry.register(Callback(name, help, function, kind))
+
+    def snapshot(self):
+        """Get the main numbers as dictionary name -> (value, kind), i.e. for HA"""
+        values = {
+            "packets_received": (self.packetsReceived.total(), "counter"),
+            "packets_dropped": (self.packetsDropped.total(), "counter"),
+        }
+        for metric in self.registry.metrics:
+            if isinstance(metric, Callback):
+                name = metric.name.replace("meshtastic2hass_", "").replace("_total", "")
+                values[name] = (metric.get(), metric.kind)
+        return values
+
+    async def serve(self, host, port):
+        """Serve the metrics via HTTP on the running asyncio loop"""
+        return await asyncio.start_server(self._handleRequest, host, port)
+
+    async def _handleRequest(self, reader, writer):
+        """Handle a HTTP request, only GET /metrics is served"""
+        try:
+            requestLine = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Skip the request headers
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = requestLine.decode("latin-1").split()
+            path = parts[1].split("?")[0] if len(parts) >= 2 else None
+            if parts and parts[0] == "GET" and path in ("/metrics", "/"):
+                status = "200 OK"
+                body = self.registry.render().encode("utf-8")
+            else:
+                status = "404 Not Found"
+                body = b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
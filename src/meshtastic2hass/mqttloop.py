@@ -0,0 +1,120 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import asyncio
+
+import paho.mqtt.client as mqttClient
+
+from .backoff import Backoff
+
+
+class MQTTLoop:
+    """Drives the network I/O of a paho MQTT client from an asyncio loop.
+
+    The client socket is watched with add_reader/add_writer instead of running
+    the paho network thread, so all MQTT callbacks run on the event loop thread.
+    A lost connection is reconnected with exponential backoff and jitter, the
+    blocking TCP connect runs in the default executor.
+    """
+
+    def __init__(self, loop, mqtt, minDelay=1, maxDelay=120):
+        """Constructor for the MQTTLoop class"""
+        self.loop = loop
+        self.mqtt = mqtt
+        self.backoff = Backoff(minDelay, maxDelay)
+        self.metrics = None
+        self.task = None
+        mqtt.on_socket_open = self.onSocketOpen
+        mqtt.on_socket_close = self.onSocketClose
+        mqtt.on_socket_register_write = self.onSocketRegisterWrite
+        mqtt.on_socket_unregister_write = self.onSocketUnregisterWrite
+
+    def setMetrics(self, metrics):
+        """Set the bridge metrics counting reconnect attempts"""
+        self.metrics = metrics
+
+    def connect(self, host, port, keepalive=60):
+        """Connect to the broker and start the housekeeping task retrying a failure"""
+        try:
+            self.mqtt.connect(host, port, keepalive)
+        except OSError as ex:
+            print(f"MQTT: connect failed, retrying in background: {ex}")
+        if self.task is None:
+            self.task = self.loop.create_task(self.housekeeping())
+
+    def stop(self):
+        """Stop the housekeeping task and disconnect from the broker"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self.mqtt.disconnect()
+
+    async def housekeeping(self):
+        """Send keep alive pings, retry pending messages and reconnect once a second"""
+        while True:
+            if self.mqtt.loop_misc() == mqttClient.MQTT_ERR_NO_CONN:
+                await self.reconnect()
+            else:
+                await asyncio.sleep(1)
+
+    async def reconnect(self):
+        """Reconnect to the broker, waits for the backoff delay on failure"""
+        try:
+            await self.loop.run_in_executor(None, self.mqtt.reconnect)
+            print(f"MQTT: reconnected after {self.backoff.attempts + 1} attempts")
+            self.backoff.reset()
+            result = "success"
+        except Exception as ex:
+            delay = self.backoff.next()
+            print(
+                f"MQTT: reconnect attempt {self.backoff.attempts} failed, "
+                f"retry in {delay:.1f} s: {ex}"
+            )
+            result = "failure"
+        if self.metrics is not None:
+            self.metrics.reconnectAttempts.inc("mqtt", result)
+        if result == "failure":
+            await asyncio.sleep(delay)
+
+    def _callSoon(self, callback, *args):
+        """Run a callback on the event loop, directly when already on it"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def onSocketOpen(self, client, userdata, sock):
+        """Watch the new socket for incoming data"""
+        self._callSoon(self.loop.add_reader, sock.fileno(), client.loop_read)
+
+    def onSocketClose(self, client, userdata, sock):
+        """Stop watching the socket, it is closed after this callback"""
+        fd = sock.fileno()
+        self._callSoon(self.loop.remove_reader, fd)
+        self._callSoon(self.loop.remove_writer, fd)
+
+    def onSocketRegisterWrite(self, client, userdata, sock):
+        """Watch the socket until outgoing data is written"""
+        self._callSoon(self.loop.add_writer, sock.fileno(), client.loop_write)
+
+    def onSocketUnregisterWrite(self, client, userdata, sock):
+        """All outgoing data is written"""
+        self._callSoon(self.loop.remove_writer, sock.fileno())
@@ -0,0 +1,130 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import fnmatch
+import re
+
+# Prefix of a regular expression in a node list,
+# entries with glob characters are glob patterns
+REGEX_PREFIX = "re:"
+GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+class NodeList:
+    """Node ids, short names and patterns compiled for fast matching.
+
+    Entries starting with ! are node ids, entries starting with re: are regular
+    expressions, entries with glob characters are glob patterns and all other
+    entries are short names. Patterns are matched against id and short name.
+    Raises ValueError for an invalid regular expression.
+    """
+
+    def __init__(self, entries=()):
+        """Constructor for the NodeList class"""
+        self.ids = set()
+        self.shortNames = set()
+        patterns = []
+        for entry in entries or ():
+            entry = str(entry)
+            if entry.startswith(REGEX_PREFIX):
+                expression = entry[len(REGEX_PREFIX):]
+                pattern = f"(?:{expression})"
+                try:
+                    re.compile(expression)
+                    # Global flags are only valid at the start of the combined pattern
+                    re.compile(pattern)
+                except re.error as ex:
+                    raise ValueError(f"invalid regular expression {entry}: {ex}")
+                patterns.append(pattern)
+            elif GLOB_CHARS.search(entry):
+                patterns.append(f"(?:{fnmatch.translate(entry)})")
+            elif entry.startswith("!"):
+                self.ids.add(entry.lower())
+            else:
+                self.shortNames.add(entry)
+        # All patterns combined into one expression, compiled once
+        self.pattern = re.compile("|".join(patterns)) if patterns else None
+
+    def __bool__(self):
+        return bool(self.ids or self.shortNames or self.pattern)
+
+    def matches(self, fromId, shortName):
+        """Check whether a node is in the list"""
+        if fromId is not None and fromId.lower() in self.ids:
+            return True
+        if shortName in self.shortNames:
+            return True
+        if self.pattern is not None:
+            if fromId is not None and self.pattern.fullmatch(fromId):
+                return True
+            if shortName is not None and self.pattern.fullmatch(shortName):
+                return True
+        return False
+
+
+class NodeFilter:
+    """Decides which nodes and portnums are forwarded to Home Assistant.
+
+    A node is forwarded when it is in the allow list, or the allow list is
+    empty, and it is not in the deny list. Per node portnum rules, keyed by
+    node id or short name, limit the forwarded portnums of a node. Decisions
+    are cached per node, so patterns are evaluated once per node.
+    """
+
+    def __init__(self, allow=(), deny=(), portnums=None, cacheSize=10000):
+        """Constructor for the NodeFilter class"""
+        self.allow = NodeList(allow)
+        self.deny = NodeList(deny)
+        self.portnums = {}
+        for key, values in (portnums or {}).items():
+            key = str(key)
+            key = key.lower() if key.startswith("!") else key
+            self.portnums[key] = frozenset(values)
+        self.cacheSize = cacheSize
+        # (fromId, shortName) -> (allowed, denied, portnums)
+        self.cache = {}
+
+    def __bool__(self):
+        return bool(self.allow or self.deny or self.portnums)
+
+    def _lookup(self, fromId, shortName):
+        """Get the cached decision of a node"""
+        key = (fromId, shortName)
+        decision = self.cache.get(key)
+        if decision is None:
+            if len(self.cache) >= self.cacheSize:
+                self.cache.clear()
+            portnums = self.portnums.get(fromId.lower() if fromId else fromId)
+            if portnums is None:
+                portnums = self.portnums.get(shortName)
+            decision = self.cache[key] = (
+                not self.allow or self.allow.matches(fromId, shortName),
+                self.deny.matches(fromId, shortName),
+                portnums,
+            )
+        return decision
+
+    def isForwarded(self, fromId, shortName, portnum=None, applyAllowList=True):
+        """Check whether a packet of a node is forwarded.
+
+        Without applyAllowList only the deny list and the portnum rules apply,
+        i.e. for channel text.
+        """
+        allowed, denied, portnums = self._lookup(fromId, shortName)
+        if denied or (applyAllowList and not allowed):
+            return False
+        return portnums is None or portnum is None or portnum in portnums
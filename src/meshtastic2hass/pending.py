@@ -0,0 +1,102 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import threading
+import time
+from collections import OrderedDict
+
+
+class PendingPackets:
+    """Bounded, time expiring buffer of packets from nodes without node info.
+
+    Packets are held per sender until its NODEINFO_APP arrives. At most
+    perNode packets are held per sender, the newest replace the oldest. At
+    most maxNodes senders are held, the sender held longest is evicted first.
+    Senders are expired ttl seconds after their first held packet. Packets
+    are held with the radio context that received them, its interface is
+    replaced on reconnect.
+    """
+
+    def __init__(self, perNode=8, maxNodes=256, ttl=600, clock=time.monotonic):
+        """Constructor for the PendingPackets class"""
+        self.perNode = int(perNode)
+        self.maxNodes = int(maxNodes)
+        self.ttl = float(ttl)
+        self.clock = clock
+        self.lock = threading.Lock()
+        # fromId -> (time of first held packet, [(packet, radio)]), oldest first
+        self.nodes = OrderedDict()
+        self.held = 0
+        self.released = 0
+        self.expired = 0
+        self.dropped = 0
+
+    def hold(self, fromId, packet, radio):
+        """Hold a packet, returns True when the sender was not held before."""
+        if self.perNode <= 0 or self.maxNodes <= 0:
+            self.dropped += 1
+            return False
+        with self.lock:
+            entry = self.nodes.get(fromId)
+            isNew = entry is None
+            if isNew:
+                if len(self.nodes) >= self.maxNodes:
+                    _, (_, evicted) = self.nodes.popitem(last=False)
+                    self.dropped += len(evicted)
+                entry = self.nodes[fromId] = (self.clock(), [])
+            packets = entry[1]
+            if len(packets) >= self.perNode:
+                packets.pop(0)
+                self.dropped += 1
+            packets.append((packet, radio))
+            self.held += 1
+            return isNew
+
+    def release(self, fromId):
+        """Remove the packets of a sender, returns a list of (packet, radio)"""
+        with self.lock:
+            entry = self.nodes.pop(fromId, None)
+        if entry is None:
+            return []
+        self.released += len(entry[1])
+        return entry[1]
+
+    def expire(self):
+        """Remove expired senders, returns a list of (fromId, [(packet, radio)])"""
+        now = self.clock()
+        expired = []
+        with self.lock:
+            # The oldest senders are first in order
+            while self.nodes:
+                fromId, (firstTime, packets) = next(iter(self.nodes.items()))
+                if now - firstTime < self.ttl:
+                    break
+                self.nodes.popitem(last=False)
+                self.expired += len(packets)
+                expired.append((fromId, packets))
+        return expired
+
+    def getPending(self):
+        """Get the number of held packets"""
+        with self.lock:
+            return sum(len(packets) for _, packets in self.nodes.values())
+
+    def __contains__(self, fromId):
+        return fromId in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
@@ -0,0 +1,121 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import math
+import threading
+import time
+
+# Mean earth radius in meters
+EARTH_RADIUS = 6371008.8
+# Length of one degree of latitude in meters
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great circle distance in meters between two positions in degrees"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dPhi = phi2 - phi1
+    dLambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dPhi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dLambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def equirectangular(lat1, lon1, lat2, lon2):
+    """Fast approximation of the distance in meters between two close positions"""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS * math.hypot(x, y)
+
+
+DISTANCES = {"haversine": haversine, "equirectangular": equirectangular}
+
+
+def getDecimals(precision):
+    """Get the number of decimals of a coordinate matching a precision in meters"""
+    if precision <= 0:
+        return None
+    return max(0, round(-math.log10(precision / METERS_PER_DEGREE)))
+
+
+class LastPosition:
+    """Last published position of a node."""
+
+    __slots__ = ("time", "latitude", "longitude")
+
+    def __init__(self, now, latitude, longitude):
+        """Constructor for the LastPosition class"""
+        self.time = now
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+class PositionFilter:
+    """Movement threshold and heartbeat of position updates per node.
+
+    A position is published when the node moved minDistance meters or more
+    since the last published position, or when heartbeat seconds passed
+    since then. A heartbeat of 0 publishes every position. With precision
+    in meters, coordinates are rounded to match it. The last published
+    position is kept in the node entry, so it is evicted with the node.
+    """
+
+    def __init__(
+        self,
+        minDistance=0,
+        heartbeat=0,
+        distance="haversine",
+        precision=0,
+        clock=time.monotonic,
+    ):
+        """Constructor for the PositionFilter class"""
+        if distance not in DISTANCES:
+            raise ValueError(f"Unknown distance: {distance}")
+        self.minDistance = float(minDistance)
+        self.heartbeat = float(heartbeat)
+        self.distance = DISTANCES[distance]
+        self.precision = float(precision)
+        self.decimals = getDecimals(self.precision)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.suppressed = 0
+
+    def reduce(self, latitude, longitude):
+        """Round a position to the precision, returns (latitude, longitude)"""
+        if self.decimals is None:
+            return latitude, longitude
+        return round(latitude, self.decimals), round(longitude, self.decimals)
+
+    def submit(self, node, latitude, longitude):
+        """Submit a position of a node, returns True when it shall be published."""
+        if self.heartbeat <= 0 or latitude is None or longitude is None:
+            return True
+        now = self.clock()
+        with self.lock:
+            last = node.position
+            if last is not None and now - last.time < self.heartbeat:
+                moved = self.distance(
+                    last.latitude, last.longitude, latitude, longitude
+                )
+                if moved < self.minDistance or (self.minDistance <= 0 and moved == 0):
+                    self.suppressed += 1
+                    return False
+            node.position = LastPosition(now, latitude, longitude)
+        return True
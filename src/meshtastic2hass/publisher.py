@@ -0,0 +1,275 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Overflow policies when the outbound queue is full
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+
+
+class Publisher:
+    """Asynchronous MQTT publish stage.
+
+    Messages are put in a bounded outbound queue and published fire-and-forget.
+    At most maxInflight messages are waiting for a broker acknowledge, further
+    messages are sent when acknowledges arrive via the on_publish callback.
+    Retained messages, i.e. discovery configs, wait in their own queue keyed
+    by topic, they are sent first and never evicted, a newer message for the
+    same topic replaces the queued one. With the block policy, the radio
+    readers wait in waitForRoom() while the queue is full, messages of packets
+    already handed over still evict the oldest. With a spool, state messages
+    are stored on disk while the broker is not connected and drained in order
+    after reconnect.
+    """
+
+    def __init__(
+        self, queueSize=1000, maxInflight=20, overflow=DROP_OLDEST, blocking=False
+    ):
+        """Constructor for the Publisher class"""
+        if overflow not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown queue overflow policy: {overflow}")
+        self.mqtt = None
+        # Thread delivering the acknowledges when not the paho network thread
+        self.networkThread = None
+        self.metrics = None
+        self.tracer = None
+        self.spool = None
+        self.connected = False
+        # Shutting down, the radio readers no longer wait for room
+        self.closing = False
+        self.queueSize = max(1, int(queueSize))
+        self.maxInflight = max(1, int(maxInflight))
+        self.overflow = overflow
+        self.blocking = blocking
+        self.queue = deque()
+        # Topic, (topic, None) for a removal, -> queued retained message, never evicted
+        self.retainedQueue = OrderedDict()
+        # Message id -> (topic, send time, trace) of messages waiting for acknowledge
+        self.inflight = {}
+        # Acknowledges that arrived before publish() returned the message id
+        self.earlyAcks = set()
+        # Messages currently handed over to the MQTT client
+        self.sending = 0
+        self.lock = threading.Lock()
+        self.notFull = threading.Condition(self.lock)
+        self.published = 0
+        self.acked = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def setClient(self, mqtt):
+        """Set the MQTT client used for publishing"""
+        self.mqtt = mqtt
+
+    def setNetworkThread(self, thread):
+        """Set the thread driving the MQTT client, i.e. the event loop thread"""
+        self.networkThread = thread
+
+    def setMetrics(self, metrics):
+        """Set the bridge metrics recording the broker acknowledge latency"""
+        self.metrics = metrics
+
+    def setTracer(self, tracer):
+        """Set the tracer stamping the messages of sampled packets"""
+        self.tracer = tracer
+
+    def setSpool(self, spool):
+        """Set the spool used while the broker is not connected"""
+        self.spool = spool
+
+    def setConnected(self, connected):
+        """Set the broker connection state, sending is paused while not connected"""
+        self.connected = connected
+        if connected:
+            self.pump()
+
+    def setClosing(self, closing):
+        """Set the shutdown state, wakes up the radio readers waiting for room"""
+        with self.notFull:
+            self.closing = closing
+            self.notFull.notify_all()
+
+    def publish(self, topic, payload, qos=1, retain=False):
+        """Queue a message for publishing, returns at once unless in blocking mode."""
+        if self.blocking:
+            # Debugging only, wait for every single message to complete.
+            info = self.mqtt.publish(topic, payload, qos=qos, retain=retain)
+            # The network thread processes the acknowledge, it can not wait for it.
+            if not self._onNetworkThread():
+                info.wait_for_publish(1)
+            with self.lock:
+                self.published += 1
+            return
+        # Retained discovery configs are replayed after reconnect and not spooled.
+        # Keep spooling until the spool is drained to preserve the message order.
+        spool = self.spool
+        if spool is not None and not retain and (not self.connected or len(spool) > 0):
+            spool.put(topic, payload, qos, retain)
+            return
+        # Trace of the packet being dispatched, if sampled
+        trace = self.tracer.current if self.tracer is not None else None
+        if trace is not None:
+            trace.pending += 1
+        self._enqueue(topic, payload, qos, retain, trace)
+        if trace is not None:
+            trace.stamp("enqueue")
+        self.pump()
+
+    def drainSpool(self, limit):
+        """Move up to limit spooled messages into the queue, returns the count"""
+        if self.spool is None or not self.connected:
+            return 0
+        # Leave room for live messages, never drop spooled messages on overflow
+        with self.lock:
+            room = max(1, self.queueSize // 2) - len(self.queue)
+        messages = self.spool.take(min(int(limit), room)) if room > 0 else []
+        for message in messages:
+            self._enqueue(*message)
+        self.pump()
+        return len(messages)
+
+    def _enqueue(self, topic, payload, qos, retain, trace=None):
+        """Put a message into the outbound queue applying the overflow policy"""
+        evicted = None
+        with self.notFull:
+            if retain:
+                # Only the latest retained message of a topic matters to the broker,
+                # but HA has to see the removal of an entity before its new config
+                key = topic if payload else (topic, None)
+                replaced = self.retainedQueue.pop(key, None)
+                evicted = replaced[4] if replaced is not None else None
+                self.retainedQueue[key] = (topic, payload, qos, retain, trace)
+            elif len(self.queue) >= self.queueSize:
+                evicted = self.queue.popleft()[4]
+                self.dropped += 1
+            if not retain:
+                self.queue.append((topic, payload, qos, retain, trace))
+        if evicted is not None:
+            self.tracer.complete(evicted, "dropped")
+
+    def waitForRoom(self):
+        """Wait while the queue is full with the block policy, i.e. in a radio reader.
+
+        Never waits on the network thread, it delivers the acknowledges.
+        """
+        if self.overflow != BLOCK or self.blocking or self._onNetworkThread():
+            return
+        with self.notFull:
+            self.notFull.wait_for(
+                lambda: self.closing or len(self.queue) < self.queueSize
+            )
+
+    def pump(self):
+        """Send queued messages while the in-flight window has room."""
+        while True:
+            with self.lock:
+                if (
+                    self.mqtt is None
+                    or not self.connected
+                    or not (self.retainedQueue or self.queue)
+                    or len(self.inflight) + self.sending >= self.maxInflight
+                ):
+                    return
+                if self.retainedQueue:
+                    # Discovery configs first, HA drops states of unknown entities
+                    _, message = self.retainedQueue.popitem(last=False)
+                    topic, payload, qos, retain, trace = message
+                else:
+                    topic, payload, qos, retain, trace = self.queue.popleft()
+                    self.notFull.notify()
+                self.sending += 1
+            # Publish without holding the lock, paho may invoke callbacks meanwhile.
+            sendTime = time.perf_counter()
+            try:
+                info = self.mqtt.publish(topic, payload, qos=qos, retain=retain)
+            except Exception as ex:
+                print(f"MQTT: publish error {ex}")
+                info = None
+            if trace is not None:
+                trace.stamp("publish")
+            with self.lock:
+                self.sending -= 1
+                if info is None or (qos == 0 and info.rc != 0):
+                    # Not queued by the client, no acknowledge will follow.
+                    self.failed += 1
+                    ackTime = None
+                else:
+                    self.published += 1
+                    if info.mid not in self.earlyAcks:
+                        self.inflight[info.mid] = (topic, sendTime, trace)
+                        continue
+                    self.earlyAcks.discard(info.mid)
+                    self.acked += 1
+                    ackTime = time.perf_counter()
+            if trace is not None:
+                self.tracer.complete(trace, "failed" if ackTime is None else "puback")
+            if ackTime is not None and self.metrics is not None:
+                self.metrics.ackLatency.observe(ackTime - sendTime)
+
+    def onAck(self, mid):
+        """Acknowledge a completed message, called from the on_publish callback."""
+        if self.blocking:
+            return
+        ackTime = time.perf_counter()
+        with self.lock:
+            message = self.inflight.pop(mid, None)
+            if message is None:
+                self.earlyAcks.add(mid)
+            else:
+                self.acked += 1
+        if message is not None:
+            if message[2] is not None:
+                self.tracer.complete(message[2])
+            if self.metrics is not None:
+                self.metrics.ackLatency.observe(ackTime - message[1])
+        self.pump()
+
+    def close(self):
+        """Move the queued state messages to the spool and close it, returns the count.
+
+        Retained discovery configs are not spooled, they are replayed on start.
+        """
+        if self.spool is None:
+            return 0
+        with self.notFull:
+            messages = list(self.queue)
+            self.queue.clear()
+            self.notFull.notify_all()
+        for topic, payload, qos, retain, _ in messages:
+            self.spool.put(topic, payload, qos, retain)
+        self.spool.close()
+        self.spool = None
+        return len(messages)
+
+    def getQueueDepth(self):
+        """Get the number of queued messages"""
+        return len(self.queue) + len(self.retainedQueue)
+
+    def getInflight(self):
+        """Get the number of messages waiting for acknowledge"""
+        return len(self.inflight)
+
+    def _onNetworkThread(self):
+        """Check whether we run on the MQTT client network thread"""
+        current = threading.current_thread()
+        if self.networkThread is not None and self.networkThread is current:
+            return True
+        thread = getattr(self.mqtt, "_thread", None)
+        return thread is not None and thread is current
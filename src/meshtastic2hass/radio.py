@@ -0,0 +1,92 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+from .backoff import Backoff
+from .scheduler import DEFAULT_PRESET, MODEM_PRESETS
+
+
+class RadioContext:
+    """State of one Meshtastic radio interface.
+
+    Packets of all radios are merged into one pipeline, only the interface
+    and its channel list are kept per radio.
+    """
+
+    def __init__(self, name, device=None, useNetwork=False, hostname=None):
+        """Constructor for the RadioContext class"""
+        self.name = name
+        self.device = device
+        self.useNetwork = useNetwork
+        self.hostname = hostname
+        self.interface = None
+        # Channel names by channel index of the radio
+        self.channelList = []
+        # Spreading factor, bandwidth in kHz and coding rate used for airtime estimates
+        self.loraParams = MODEM_PRESETS[DEFAULT_PRESET]
+        self.backoff = Backoff(1, 300)
+        # Set while a lost connection is reestablished, or when closed on purpose
+        self.reconnecting = False
+        self.closing = False
+
+    def connect(self):
+        """Create the serial or network interface, returns once it is configured"""
+        # Imported on first connect, the command line and config check do not need them
+        import meshtastic.serial_interface
+        import meshtastic.tcp_interface
+
+        if self.useNetwork and isinstance(self.hostname, str):
+            self.interface = meshtastic.tcp_interface.TCPInterface(
+                self.hostname, noProto=False
+            )
+        else:
+            self.interface = meshtastic.serial_interface.SerialInterface(
+                devPath=self.device, noProto=False
+            )
+        return self.interface
+
+    def close(self):
+        """Close the interface"""
+        if self.interface is not None:
+            self.interface.close()
+
+    def setLoraConfig(self, lora):
+        """Set the LoRa parameters from the radio LoRa config"""
+        if lora.use_preset:
+            from meshtastic import config_pb2
+
+            preset = config_pb2.Config.LoRaConfig.ModemPreset.Name(lora.modem_preset)
+            self.loraParams = MODEM_PRESETS.get(preset, MODEM_PRESETS[DEFAULT_PRESET])
+        elif lora.spread_factor and lora.bandwidth and lora.coding_rate:
+            self.loraParams = (lora.spread_factor, lora.bandwidth, lora.coding_rate)
+
+    def getUtilization(self):
+        """Get channel utilization and own transmit airtime in %, None if unknown"""
+        getMyNodeInfo = getattr(self.interface, "getMyNodeInfo", None)
+        nodeInfo = getMyNodeInfo() if getMyNodeInfo is not None else None
+        deviceMetrics = (nodeInfo or {}).get("deviceMetrics") or {}
+        return deviceMetrics.get("channelUtilization"), deviceMetrics.get("airUtilTx")
+
+    def getChannelIndex(self, channelName):
+        """Get the index of a channel by name, None when the radio has no such one"""
+        try:
+            return self.channelList.index(channelName)
+        except ValueError:
+            return None
+
+    def __repr__(self):
+        target = self.hostname if self.useNetwork else self.device
+        return f"RadioContext({self.name}, {target})"
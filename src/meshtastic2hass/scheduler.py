@@ -0,0 +1,294 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import bisect
+import itertools
+import math
+import time
+
+# Modem preset -> (spreading factor, bandwidth in kHz, coding rate denominator)
+MODEM_PRESETS = {
+    "SHORT_TURBO": (7, 500, 5),
+    "SHORT_FAST": (7, 250, 5),
+    "SHORT_SLOW": (8, 250, 5),
+    "MEDIUM_FAST": (9, 250, 5),
+    "MEDIUM_SLOW": (10, 250, 5),
+    "LONG_FAST": (11, 250, 5),
+    "LONG_MODERATE": (11, 125, 8),
+    "LONG_SLOW": (12, 125, 8),
+    "VERY_LONG_SLOW": (12, 62.5, 8),
+}
+DEFAULT_PRESET = "LONG_FAST"
+
+# Meshtastic preamble length in symbols
+PREAMBLE_SYMBOLS = 16
+# Mesh packet header, encryption and protobuf overhead of a text message in bytes
+PACKET_OVERHEAD = 32
+
+# Priorities, lower values are sent first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# Rules for repeated identical messages
+KEEP = "keep"
+DROP = "drop"
+MERGE = "merge"
+
+
+def airtime(loraParams, payloadLength):
+    """Estimate the LoRa time on air in seconds of a packet with header and CRC"""
+    spreadingFactor, bandwidth, codingRate = loraParams
+    symbolTime = (2 ** spreadingFactor) / (bandwidth * 1000)
+    # Low data rate optimization is required for symbols longer than 16 ms
+    lowDataRate = 1 if symbolTime > 0.016 else 0
+    payloadSymbols = 8 + max(
+        math.ceil(
+            (8 * payloadLength - 4 * spreadingFactor + 28 + 16)
+            / (4 * (spreadingFactor - 2 * lowDataRate))
+        )
+        * codingRate,
+        0,
+    )
+    return (PREAMBLE_SYMBOLS + 4.25 + payloadSymbols) * symbolTime
+
+
+class OutboundMessage:
+    """Text message waiting for airtime."""
+
+    __slots__ = (
+        "priority", "seq", "radio", "channelIndex", "channelName", "text",
+        "airtime", "queued", "count",
+    )
+
+    def __init__(
+        self, priority, seq, radio, channelIndex, channelName, text, airtime, queued
+    ):
+        """Constructor for the OutboundMessage class"""
+        self.priority = priority
+        self.seq = seq
+        self.radio = radio
+        self.channelIndex = channelIndex
+        self.channelName = channelName
+        self.text = text
+        self.airtime = airtime
+        self.queued = queued
+        # Number of merged identical messages
+        self.count = 1
+
+    def getText(self):
+        """Get the text to send, merged messages carry their count"""
+        return self.text if self.count == 1 else f"{self.text} (x{self.count})"
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class TokenBucket:
+    """Airtime budget of a channel in seconds."""
+
+    __slots__ = ("tokens", "lastRefill")
+
+    def __init__(self, tokens, now):
+        """Constructor for the TokenBucket class"""
+        self.tokens = tokens
+        self.lastRefill = now
+
+
+class OutboundScheduler:
+    """Airtime aware scheduler of text messages from MQTT to the mesh.
+
+    Every channel of a radio has a token bucket holding airtime in seconds.
+    It is refilled with airtimeShare seconds per second, reduced while the
+    radio reports a high channel utilization and paused while its own
+    transmit airtime exceeds maxAirUtilTx percent. Messages are sent by
+    priority, high before normal before low, at most queueSize messages
+    wait. Repeated identical messages within duplicateWindow seconds are
+    kept, dropped or merged into one.
+    """
+
+    def __init__(
+        self,
+        queueSize=50,
+        airtimeShare=0.05,
+        burst=10.0,
+        maxAge=300.0,
+        duplicates=MERGE,
+        duplicateWindow=60.0,
+        maxChannelUtilization=25.0,
+        maxAirUtilTx=10.0,
+        channelPriorities=None,
+        clock=time.monotonic,
+    ):
+        """Constructor for the OutboundScheduler class"""
+        if duplicates not in (KEEP, DROP, MERGE):
+            raise ValueError(f"Unknown duplicate rule: {duplicates}")
+        self.queueSize = max(1, int(queueSize))
+        self.airtimeShare = float(airtimeShare)
+        self.burst = float(burst)
+        self.maxAge = float(maxAge)
+        self.duplicates = duplicates
+        self.duplicateWindow = float(duplicateWindow)
+        self.maxChannelUtilization = float(maxChannelUtilization)
+        self.maxAirUtilTx = float(maxAirUtilTx)
+        # Channel name -> priority of its messages
+        self.channelPriorities = dict(channelPriorities or {})
+        self.clock = clock
+        self.metrics = None
+        # Queued messages sorted by priority and arrival
+        self.queue = []
+        self.seq = itertools.count()
+        # (radio name, channel index) -> TokenBucket
+        self.buckets = {}
+        # (radio name, channel index, text) -> queued message or time sent
+        self.recent = {}
+        self.sent = 0
+        self.merged = 0
+        self.rejected = {}
+
+    def setMetrics(self, metrics):
+        """Set the bridge metrics counting rejected messages"""
+        self.metrics = metrics
+
+    def _reject(self, reason):
+        """Count a rejected message"""
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        if self.metrics is not None:
+            self.metrics.outboundRejected.inc(reason)
+
+    def submit(self, radio, channelIndex, channelName, text, priority=None):
+        """Queue a text for a channel, returns False when rejected.
+
+        Without priority the priority configured for the channel applies.
+        """
+        now = self.clock()
+        key = (radio.name, channelIndex, text)
+        if self.duplicates != KEEP:
+            previous = self.recent.get(key)
+            if isinstance(previous, OutboundMessage) and previous in self.queue:
+                if self.duplicates == MERGE:
+                    previous.count += 1
+                    self.merged += 1
+                    return True
+                self._reject("duplicate")
+                return False
+            if previous is not None and not isinstance(previous, OutboundMessage):
+                if now - previous < self.duplicateWindow:
+                    self._reject("duplicate")
+                    return False
+        if priority is None:
+            priority = self.channelPriorities.get(channelName, "normal")
+        level = PRIORITIES.get(priority, PRIORITIES["normal"])
+        message = OutboundMessage(
+            level, next(self.seq), radio, channelIndex, channelName, text,
+            airtime(radio.loraParams, len(text.encode("utf-8")) + PACKET_OVERHEAD), now,
+        )
+        if len(self.queue) >= self.queueSize:
+            # Evict the newest lowest priority message if the new one ranks higher
+            if message < self.queue[-1]:
+                evicted = self.queue.pop()
+                self._forget(evicted)
+                self._reject("full")
+            else:
+                self._reject("full")
+                return False
+        bisect.insort(self.queue, message)
+        if self.duplicates != KEEP:
+            self.recent[key] = message
+        return True
+
+    def _forget(self, message):
+        """Remove a message from the duplicate index"""
+        key = (message.radio.name, message.channelIndex, message.text)
+        if self.recent.get(key) is message:
+            del self.recent[key]
+
+    def getRate(self, radio):
+        """Get the airtime refill rate of a radio in seconds per second"""
+        utilization, airUtilTx = radio.getUtilization()
+        if airUtilTx is not None and airUtilTx >= self.maxAirUtilTx:
+            # The radio already used its transmit budget, i.e. the duty cycle limit
+            return 0.0
+        rate = self.airtimeShare
+        if utilization is not None and self.maxChannelUtilization > 0:
+            rate *= max(0.0, 1.0 - utilization / self.maxChannelUtilization)
+        return rate
+
+    def _refill(self, radio, channelIndex, now, rates):
+        """Get the refilled token bucket of a channel"""
+        key = (radio.name, channelIndex)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.burst, now)
+            return bucket
+        rate = rates.get(radio.name)
+        if rate is None:
+            rate = rates[radio.name] = self.getRate(radio)
+        refill = (now - bucket.lastRefill) * rate
+        bucket.tokens = min(self.burst, bucket.tokens + refill)
+        bucket.lastRefill = now
+        return bucket
+
+    def poll(self):
+        """Take the messages which may be sent now, in priority order"""
+        now = self.clock()
+        ready = []
+        keep = []
+        blocked = set()
+        rates = {}
+        for message in self.queue:
+            if now - message.queued > self.maxAge:
+                self._forget(message)
+                self._reject("expired")
+                continue
+            channel = (message.radio.name, message.channelIndex)
+            if channel in blocked or message.radio.interface is None:
+                keep.append(message)
+                continue
+            bucket = self._refill(message.radio, message.channelIndex, now, rates)
+            # Messages longer than the burst may run the bucket into debt
+            if bucket.tokens >= min(message.airtime, self.burst):
+                bucket.tokens -= message.airtime
+                ready.append(message)
+                self.sent += 1
+                if self.duplicates != KEEP:
+                    key = (message.radio.name, message.channelIndex, message.text)
+                    self.recent[key] = now
+            else:
+                # Keep the priority order within a channel
+                blocked.add(channel)
+                keep.append(message)
+        self.queue = keep
+        self._pruneRecent(now)
+        return ready
+
+    def _pruneRecent(self, now):
+        """Forget sent messages older than the duplicate window"""
+        expired = [
+            key
+            for key, value in self.recent.items()
+            if not isinstance(value, OutboundMessage)
+            and now - value >= self.duplicateWindow
+        ]
+        for key in expired:
+            del self.recent[key]
+
+    def getQueueDepth(self):
+        """Get the number of queued messages"""
+        return len(self.queue)
+
+    def getRejected(self):
+        """Get the number of rejected messages"""
+        return sum(self.rejected.values())
@@ -0,0 +1,366 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+
+# Telemetry metric group carried by a state topic of the built-in sensors
+TELEMETRY_GROUPS = {
+    "device": "deviceMetrics",
+    "environment": "environmentMetrics",
+    "power": "powerMetrics",
+}
+
+# Home Assistant sensor configuration send via MQTT.
+# A change of a value by less than its deadband, absolute or relative in percent,
+# does not publish a new state message.
+DEFAULT_SENSORS = (
+    dict(
+        id="battery_voltage",
+        name="Battery Voltage",
+        state_topic="device",
+        device_class="voltage",
+        unit="V",
+        property="voltage",
+        type="float",
+        deadband=0.05,
+    ),
+    dict(
+        id="battery_percent",
+        name="Battery Level",
+        state_topic="device",
+        device_class="battery",
+        unit="%",
+        property="batteryLevel",
+        type="float",
+        deadband=1,
+    ),
+    dict(
+        id="chutil",
+        name="Channel Util",
+        state_topic="device",
+        device_class=None,
+        unit="%",
+        property="channelUtilization",
+        type="float",
+        deadband=1,
+    ),
+    dict(
+        id="airutiltx",
+        name="Air Util Tx",
+        state_topic="device",
+        device_class=None,
+        unit="%",
+        property="airUtilTx",
+        type="float",
+        deadband=1,
+    ),
+    dict(
+        id="temperature",
+        name="Temperature",
+        state_topic="environment",
+        device_class="temperature",
+        unit="°C",
+        property="temperature",
+        type="float",
+        deadband=0.2,
+    ),
+    dict(
+        id="humidity",
+        name="Humidity",
+        state_topic="environment",
+        device_class="humidity",
+        unit="%",
+        property="relativeHumidity",
+        type="float",
+        deadband=1,
+    ),
+    dict(
+        id="pressure",
+        name="Pressure",
+        state_topic="environment",
+        device_class="atmospheric_pressure",
+        unit="hPa",
+        property="barometricPressure",
+        type="float",
+        deadband=0.5,
+    ),
+    dict(
+        id="voltage",
+        name="Voltage",
+        state_topic="environment",
+        device_class="voltage",
+        unit="V",
+        property="voltage",
+        type="float",
+        deadband=0.05,
+    ),
+    dict(
+        id="current",
+        name="Current",
+        state_topic="environment",
+        device_class="current",
+        unit="mA",
+        property="current",
+        type="float",
+        deadband="5%",
+    ),
+    dict(
+        id="rssi",
+        name="RSSI",
+        state_topic="device",
+        device_class="signal_strength",
+        unit="dBm",
+        property="rssi",
+        type="int",
+        deadband=5,
+    ),
+    dict(
+        id="snr",
+        name="SNR",
+        state_topic="device",
+        device_class=None,
+        unit=None,
+        property="snr",
+        type="float",
+        deadband=2,
+    ),
+    dict(
+        id="uptime",
+        name="Uptime",
+        state_topic="device",
+        device_class="duration",
+        unit="s",
+        property="uptimeSeconds",
+        type="int",
+        deadband=3600,
+    ),
+    dict(
+        id="hopdistance",
+        name="Hop Distance",
+        state_topic="device",
+        device_class=None,
+        unit=None,
+        property="hopDistance",
+        type="int",
+        deadband=0,
+    ),
+    dict(
+        id="ch1_voltage",
+        name="Voltage Sensor 1",
+        state_topic="power",
+        device_class="voltage",
+        unit="V",
+        property="ch1Voltage",
+        type="float",
+        deadband=0.05,
+    ),
+    dict(
+        id="ch1_current",
+        name="Current Sensor 1",
+        state_topic="power",
+        device_class="current",
+        unit="mA",
+        property="ch1Current",
+        type="float",
+        deadband="5%",
+    ),
+    dict(
+        id="ch2_voltage",
+        name="Voltage Sensor 2",
+        state_topic="power",
+        device_class="voltage",
+        unit="V",
+        property="ch2Voltage",
+        type="float",
+        deadband=0.05,
+    ),
+    dict(
+        id="ch2_current",
+        name="Current Sensor 2",
+        state_topic="power",
+        device_class="current",
+        unit="mA",
+        property="ch2Current",
+        type="float",
+        deadband="5%",
+    ),
+    dict(
+        id="ch3_voltage",
+        name="Voltage Sensor 3",
+        state_topic="power",
+        device_class="voltage",
+        unit="V",
+        property="ch3Voltage",
+        type="float",
+        deadband=0.05,
+    ),
+    dict(
+        id="ch3_current",
+        name="Current Sensor 3",
+        state_topic="power",
+        device_class="current",
+        unit="mA",
+        property="ch3Current",
+        type="float",
+        deadband="5%",
+    ),
+)
+
+# Fields of a sensor entry and their defaults, entries without default are required
+SENSOR_FIELDS = {
+    "id": None,
+    "name": None,
+    "state_topic": None,
+    "property": None,
+    "group": "",
+    "device_class": "",
+    "unit": "",
+    "type": "float",
+    "state_class": "measurement",
+    "icon": "",
+    "deadband": 0,
+}
+
+# Value template per sensor type
+VALUE_TEMPLATES = {
+    "float": "{{{{ (value_json.{} | float) | round(1) }}}}",
+    "int": "{{{{ (value_json.{} | int) }}}}",
+    "string": "{{{{ value_json.{} }}}}",
+}
+
+
+class Sensor:
+    """Compiled, immutable Home Assistant sensor definition."""
+
+    __slots__ = (
+        "id", "name", "stateTopic", "property", "group", "deviceClass", "unit",
+        "type", "stateClass", "icon", "deadband", "uniqueIdSuffix", "valueTemplate",
+    )
+
+    def __init__(self, entry):
+        """Constructor for the Sensor class"""
+        setField = super().__setattr__
+        setField("id", str(entry["id"]))
+        setField("name", str(entry["name"]))
+        setField("stateTopic", str(entry["state_topic"]))
+        setField("property", str(entry["property"]))
+        setField("group", entry["group"] or TELEMETRY_GROUPS.get(self.stateTopic, ""))
+        setField("deviceClass", entry["device_class"] or None)
+        setField("unit", entry["unit"] or None)
+        setField("type", entry["type"])
+        setField("stateClass", entry["state_class"] or None)
+        setField("icon", entry["icon"] or None)
+        setField("deadband", entry["deadband"])
+        setField("uniqueIdSuffix", f"_{self.id}")
+        setField("valueTemplate", VALUE_TEMPLATES[self.type].format(self.property))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Sensor {self.id} is read only")
+
+    def __repr__(self):
+        return f"Sensor({self.id}, {self.group}.{self.property} -> {self.stateTopic})"
+
+
+class SensorRegistry:
+    """Immutable registry of compiled sensors.
+
+    Sensors are indexed by state topic, by telemetry metric group and by
+    (metric group, property), so packet handlers never walk the sensor table.
+    """
+
+    __slots__ = ("sensors", "byId", "byTopic", "byGroup", "byProperty", "groups")
+
+    def __init__(self, sensors):
+        """Constructor for the SensorRegistry class"""
+        byTopic = {}
+        byGroup = {}
+        for sensor in sensors:
+            byTopic.setdefault(sensor.stateTopic, []).append(sensor)
+            byGroup.setdefault(sensor.group, []).append(sensor)
+        setField = super().__setattr__
+        setField("sensors", tuple(sensors))
+        setField("byId", {sensor.id: sensor for sensor in sensors})
+        setField(
+            "byTopic", {topic: tuple(entries) for topic, entries in byTopic.items()}
+        )
+        setField(
+            "byGroup", {group: tuple(entries) for group, entries in byGroup.items()}
+        )
+        setField(
+            "byProperty",
+            {(sensor.group, sensor.property): sensor for sensor in sensors},
+        )
+        # Telemetry metric group -> state topic, i.e. deviceMetrics -> device
+        setField("groups", {sensor.group: sensor.stateTopic for sensor in sensors})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SensorRegistry is read only")
+
+    def __len__(self):
+        return len(self.sensors)
+
+
+def compileSensors(entries=(), defaults=DEFAULT_SENSORS):
+    """Compile the built-in sensors and sensor entries of config.toml into a registry.
+
+    An entry with the id of a known sensor overrides its fields, an entry with
+    enabled = false removes it. Entries with a new id add a sensor. Raises
+    ValueError on an invalid entry.
+    """
+    merged = {}
+    for entry in list(defaults) + list(entries or ()):
+        entry = dict(entry)
+        sensorId = entry.get("id")
+        if not sensorId:
+            raise ValueError(f"Sensor without id: {entry}")
+        if entry.pop("enabled", True) is False:
+            merged.pop(sensorId, None)
+            continue
+        unknown = set(entry) - set(SENSOR_FIELDS)
+        if unknown:
+            raise ValueError(
+                f"Sensor {sensorId}: unknown fields {', '.join(sorted(unknown))}"
+            )
+        merged[sensorId] = {**merged.get(sensorId, {}), **entry}
+    sensors = []
+    for sensorId, entry in merged.items():
+        entry = {
+            field: entry.get(field, default) for field, default in SENSOR_FIELDS.items()
+        }
+        missing = [
+            field
+            for field, value in entry.items()
+            if value is None and SENSOR_FIELDS[field] is None
+        ]
+        if missing:
+            raise ValueError(f"Sensor {sensorId}: missing fields {', '.join(missing)}")
+        if entry["type"] not in VALUE_TEMPLATES:
+            raise ValueError(f"Sensor {sensorId}: unknown type {entry['type']}")
+        if not entry["group"] and entry["state_topic"] not in TELEMETRY_GROUPS:
+            raise ValueError(
+                f"Sensor {sensorId}: group is required for state topic "
+                f"{entry['state_topic']}"
+            )
+        sensors.append(Sensor(entry))
+    registry = SensorRegistry(sensors)
+    for group in registry.byGroup:
+        topics = {sensor.stateTopic for sensor in registry.byGroup[group]}
+        if len(topics) > 1:
+            raise ValueError(
+                f"Metric group {group} has more than one state topic: "
+                f"{', '.join(sorted(topics))}"
+            )
+    return registry
@@ -0,0 +1,47 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import json
+
+try:
+    # Optional faster JSON encoder, install with pip install meshtastic2hass[fast]
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _dumpsJson(obj):
+    """Serialize an object into compact JSON bytes using the standard library"""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _dumpsOrjson(obj):
+    """Serialize an object into compact JSON bytes using orjson"""
+    try:
+        return orjson.dumps(obj)
+    except TypeError:
+        # i.e. integers exceeding 64 bit, let the standard library handle them
+        return _dumpsJson(obj)
+
+
+# Serialize an object into compact JSON bytes, used for all MQTT payloads.
+dumps = _dumpsJson if orjson is None else _dumpsOrjson
+
+
+def getEncoderName():
+    """Get the name of the JSON encoder in use"""
+    return "json" if orjson is None else "orjson"
@@ -0,0 +1,78 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import json
+import os
+import time
+
+# Snapshot file format version, version 1 snapshots map node ids to short names
+SNAPSHOT_VERSION = 2
+
+
+def writeSnapshot(path, radios, nodes, discovery, online=()):
+    """Write a warm start snapshot atomically.
+
+    radios maps a radio name to its channel list, nodes maps a node id to a
+    dictionary of its shortName and the lastSeen time in seconds since the
+    epoch, discovery maps a config topic to the announced payload and
+    online lists the ids of the nodes announced online.
+    """
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "time": time.time(),
+        "radios": {
+            name: {"channels": list(channels)} for name, channels in radios.items()
+        },
+        "nodes": nodes,
+        "discovery": discovery,
+        "online": list(online),
+    }
+    tmpPath = f"{path}.tmp"
+    with open(tmpPath, "w", encoding="utf-8") as file:
+        json.dump(snapshot, file, separators=(",", ":"), ensure_ascii=False)
+    # Readers see either the old or the new snapshot, never a partial one
+    os.replace(tmpPath, path)
+
+
+def readSnapshot(path):
+    """Read a warm start snapshot, None if missing, unreadable or of another version"""
+    try:
+        with open(path, encoding="utf-8") as file:
+            snapshot = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as ex:
+        print(f"Snapshot: unable to read {path}: {ex}")
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") not in (
+        1,
+        SNAPSHOT_VERSION,
+    ):
+        print(f"Snapshot: ignoring {path} of unknown version")
+        return None
+    snapshot.setdefault("radios", {})
+    snapshot.setdefault("nodes", {})
+    if snapshot["version"] == 1:
+        # Nodes of a version 1 snapshot count as seen when it was written
+        lastSeen = float(snapshot.get("time", 0))
+        snapshot["nodes"] = {
+            fromId: {"shortName": shortName, "lastSeen": lastSeen}
+            for fromId, shortName in snapshot["nodes"].items()
+        }
+    snapshot.setdefault("discovery", {})
+    snapshot.setdefault("online", [])
+    return snapshot
@@ -0,0 +1,139 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import sqlite3
+import threading
+import time
+
+
+class Spool:
+    """Disk backed store-and-forward spool for MQTT messages.
+
+    Messages are stored in a SQLite database in WAL mode while the broker is
+    unavailable and taken out in order after reconnect. The number of messages,
+    their total size and their age are capped, the oldest messages are evicted.
+    """
+
+    def __init__(
+        self, path, maxMessages=100000, maxBytes=50000000, maxAge=86400, clock=time.time
+    ):
+        """Constructor for the Spool class"""
+        self.path = path
+        self.maxMessages = int(maxMessages)
+        self.maxBytes = int(maxBytes)
+        self.maxAge = float(maxAge)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "ts REAL NOT NULL, "
+            "topic TEXT NOT NULL, "
+            "payload BLOB, "
+            "qos INTEGER NOT NULL, "
+            "retain INTEGER NOT NULL)"
+        )
+        self.lastExpire = 0
+        self.count = 0
+        self.bytes = 0
+        self.evicted = 0
+        with self.lock:
+            self._expire()
+            self._updateStats()
+
+    def put(self, topic, payload, qos=1, retain=False):
+        """Append a message to the spool"""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self.lock:
+            now = self.clock()
+            self.db.execute(
+                "INSERT INTO spool (ts, topic, payload, qos, retain) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (now, topic, payload, qos, int(retain)),
+            )
+            self.count += 1
+            self.bytes += len(payload or b"")
+            # Expire by age at most once per second, caps are checked on every put
+            if now - self.lastExpire >= 1:
+                self._expire()
+            if self.count > self.maxMessages or self.bytes > self.maxBytes:
+                self._evictOldest()
+
+    def take(self, limit):
+        """Remove and return up to limit oldest messages.
+
+        Returns a list of (topic, payload, qos, retain).
+        """
+        with self.lock:
+            if self.count == 0:
+                return []
+            self._expire()
+            rows = self.db.execute(
+                "SELECT id, topic, payload, qos, retain FROM spool ORDER BY id LIMIT ?",
+                (int(limit),),
+            ).fetchall()
+            if not rows:
+                return []
+            self.db.execute("DELETE FROM spool WHERE id <= ?", (rows[-1][0],))
+            self.count -= len(rows)
+            self.bytes -= sum(len(row[2] or b"") for row in rows)
+            return [
+                (topic, payload, qos, bool(retain))
+                for _, topic, payload, qos, retain in rows
+            ]
+
+    def close(self):
+        """Close the spool database"""
+        with self.lock:
+            self.db.close()
+
+    def __len__(self):
+        return self.count
+
+    def _expire(self):
+        """Delete messages older than the maximum age, lock must be held"""
+        now = self.clock()
+        self.lastExpire = now
+        cursor = self.db.execute("DELETE FROM spool WHERE ts < ?", (now - self.maxAge,))
+        if cursor.rowcount > 0:
+            self.evicted += cursor.rowcount
+            self._updateStats()
+
+    def _evictOldest(self):
+        """Delete the oldest messages until the caps are met, lock must be held"""
+        while self.count > self.maxMessages or self.bytes > self.maxBytes:
+            # Evict in batches to keep the number of statements low
+            batch = max(1, self.count - self.maxMessages, self.count // 100)
+            cursor = self.db.execute(
+                "DELETE FROM spool WHERE id IN "
+                "(SELECT id FROM spool ORDER BY id LIMIT ?)",
+                (batch,),
+            )
+            self.evicted += max(cursor.rowcount, 0)
+            self._updateStats()
+            if cursor.rowcount <= 0:
+                break
+
+    def _updateStats(self):
+        """Read message count and total size from the database, lock must be held"""
+        self.count, self.bytes = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM spool"
+        ).fetchone()
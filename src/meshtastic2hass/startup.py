@@ -0,0 +1,60 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import contextlib
+import time
+
+
+class StartupProfile:
+    """Time spent in the stages of the bridge startup.
+
+    Stages are measured with measure() and summed when a stage runs more than
+    once, i.e. connect of several radios. The report is printed once when
+    enabled, the stages are measured either way as the cost is negligible.
+    """
+
+    def __init__(self, enabled=False, clock=time.perf_counter):
+        """Constructor for the StartupProfile class"""
+        self.enabled = enabled
+        self.clock = clock
+        self.start = clock()
+        # Stage -> seconds, in order of the first measurement
+        self.stages = {}
+        self.reported = False
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        """Measure the time spent in the with block as stage"""
+        t0 = self.clock()
+        try:
+            yield
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0.0) + self.clock() - t0
+
+    def format(self):
+        """Get the stage times as text, one line per stage"""
+        lines = ["Startup profile:"]
+        for stage, seconds in self.stages.items():
+            lines.append(f"  {stage:<16} {seconds * 1000:10.1f} ms")
+        lines.append(f"  {'total':<16} {(self.clock() - self.start) * 1000:10.1f} ms")
+        return "\n".join(lines)
+
+    def report(self):
+        """Print the stage times once, when enabled"""
+        if self.enabled and not self.reported:
+            self.reported = True
+            print(self.format())
@@ -0,0 +1,164 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import json
+import logging
+import logging.handlers
+import random
+import threading
+import time
+from collections import deque
+
+
+class Trace:
+    """Stage times of one sampled packet on its way from the radio to the broker."""
+
+    __slots__ = (
+        "packetId",
+        "fromId",
+        "portnum",
+        "received",
+        "start",
+        "stages",
+        "pending",
+        "done",
+    )
+
+    def __init__(self, packet):
+        """Constructor for the Trace class"""
+        self.packetId = packet.get("id")
+        self.fromId = packet.get("fromId")
+        self.portnum = packet.get("decoded", {}).get("portnum")
+        self.received = time.time()
+        self.start = time.perf_counter()
+        # List of (stage, seconds since receipt)
+        self.stages = [("receipt", 0.0)]
+        # Messages of the packet waiting for broker acknowledge
+        self.pending = 0
+        # Dispatch of the packet finished
+        self.done = False
+
+    def stamp(self, stage):
+        """Record the time a stage is reached"""
+        self.stages.append((stage, time.perf_counter() - self.start))
+
+    def toDict(self):
+        """Get the trace as dictionary with stage times in microseconds"""
+        return {
+            "id": self.packetId,
+            "from": self.fromId,
+            "portnum": self.portnum,
+            "received": round(self.received, 6),
+            "stages": [
+                [stage, round(offset * 1e6, 1)] for stage, offset in self.stages
+            ],
+        }
+
+
+class Tracer:
+    """Sampled end-to-end latency tracing of packets.
+
+    A share of sampleRate of the received packets is traced. The trace of
+    the packet being dispatched is the current trace, handlers and the
+    publisher stamp it at each stage. The trace is finished when the packet
+    is dispatched and all its messages are acknowledged by the broker.
+    Finished traces are kept in a ring buffer of capacity entries and
+    written as JSON lines to a rotating file when path is set.
+    """
+
+    def __init__(
+        self,
+        sampleRate=0.0,
+        capacity=1000,
+        path=None,
+        maxBytes=1000000,
+        backups=3,
+        rng=random.random,
+    ):
+        """Constructor for the Tracer class"""
+        self.sampleRate = float(sampleRate)
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.traces = deque(maxlen=max(1, int(capacity)))
+        # id of a packet handed over to the event loop -> trace
+        self.received = {}
+        self.current = None
+        self.sampled = 0
+        self.logger = None
+        if path:
+            self.logger = logging.getLogger(f"meshtastic2hass.trace.{path}")
+            self.logger.propagate = False
+            self.logger.setLevel(logging.INFO)
+            self.logger.addHandler(
+                logging.handlers.RotatingFileHandler(
+                    path, maxBytes=int(maxBytes), backupCount=int(backups)
+                )
+            )
+
+    def sample(self, packet):
+        """Start a trace on receipt of a packet, called on the radio reader thread"""
+        if self.sampleRate <= 0 or self.rng() >= self.sampleRate:
+            return None
+        trace = Trace(packet)
+        self.received[id(packet)] = trace
+        self.sampled += 1
+        return trace
+
+    def begin(self, packet):
+        """Make the trace of a packet the current trace, returns it"""
+        if not self.received:
+            return None
+        trace = self.current = self.received.pop(id(packet), None)
+        if trace is not None:
+            trace.stamp("dispatch")
+        return trace
+
+    def end(self):
+        """The current packet is dispatched, finish its trace unless messages wait"""
+        trace = self.current
+        if trace is None:
+            return
+        self.current = None
+        trace.done = True
+        if trace.pending == 0:
+            self.finish(trace)
+
+    def stamp(self, stage):
+        """Stamp the current trace, if any"""
+        if self.current is not None:
+            self.current.stamp(stage)
+
+    def complete(self, trace, stage="puback"):
+        """A message of a trace is acknowledged by the broker, or dropped or failed"""
+        trace.stamp(stage)
+        trace.pending -= 1
+        if trace.done and trace.pending == 0:
+            self.finish(trace)
+
+    def finish(self, trace):
+        """Store a finished trace"""
+        record = trace.toDict()
+        with self.lock:
+            self.traces.append(record)
+        if self.logger is not None:
+            self.logger.info(json.dumps(record))
+
+    def dump(self):
+        """Get the finished traces of the ring buffer as JSON lines"""
+        with self.lock:
+            records = list(self.traces)
+        return "\n".join(json.dumps(record) for record in records)
@@ -0,0 +1,97 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import re
+
+import pytest
+
+from meshtastic2hass.cache import TopicCache
+
+
+@pytest.fixture
+def cache(clock):
+    return TopicCache("msh", re.compile(r"[!]"), {}, maxNodes=3, ttl=60, clock=clock)
+
+
+def test_evicts_least_recently_seen_node(cache, clock):
+    for fromId in ("!a", "!b", "!c"):
+        cache.getNode(fromId, fromId[1:])
+        clock.advance(1)
+    # Seeing !a again makes !b the least recently seen node
+    cache.getNode("!a", "a")
+    cache.getNode("!d", "d")
+    _, evicted = cache.expire()
+    assert [entry.fromId for entry in evicted] == ["!b"]
+    assert list(cache.nodes) == ["!c", "!a", "!d"]
+
+
+def test_expires_nodes_not_seen_for_ttl(cache, clock):
+    cache.getNode("!a", "a")
+    clock.advance(30)
+    cache.getNode("!b", "b")
+    clock.advance(30)
+    _, evicted = cache.expire()
+    assert [entry.fromId for entry in evicted] == ["!a"]
+    assert list(cache.nodes) == ["!b"]
+    # Evicted nodes are reported once
+    assert cache.expire() == ([], [])
+
+
+def test_find_node_does_not_mark_seen(cache, clock):
+    cache.getNode("!a", "a")
+    clock.advance(59)
+    assert cache.findNode("!a").fromId == "!a"
+    clock.advance(1)
+    _, evicted = cache.expire()
+    assert [entry.fromId for entry in evicted] == ["!a"]
+    assert cache.findNode("!a") is None
+
+
+def test_renamed_node_gets_fresh_entry(cache):
+    entry = cache.getNode("!a", "a")
+    assert cache.getNode("!a", "a") is entry
+    renamed = cache.getNode("!a", "b")
+    assert renamed is not entry
+    assert renamed.shortName == "b"
+
+
+def test_offline_after(cache, clock):
+    cache.getNode("!a", "a").online = True
+    clock.advance(10)
+    cache.getNode("!b", "b").online = True
+    clock.advance(10)
+    offline, evicted = cache.expire(offlineAfter=15)
+    assert [entry.fromId for entry in offline] == ["!a"]
+    assert evicted == []
+    assert cache.getOnline() == ["!b"]
+
+
+def test_evicted_online_node_goes_offline(cache, clock):
+    cache.getNode("!a", "a").online = True
+    clock.advance(60)
+    offline, evicted = cache.expire()
+    assert offline == evicted
+    assert not evicted[0].online
+
+
+def test_restored_nodes_keep_their_age(cache, clock):
+    cache.restoreNode("!a", "a", 50)
+    cache.restoreNode("!b", "b", 10)
+    assert cache.getAges() == {"!a": 50, "!b": 10}
+    clock.advance(10)
+    _, evicted = cache.expire()
+    assert [entry.fromId for entry in evicted] == ["!a"]
@@ -0,0 +1,64 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+from meshtastic2hass.coalescer import Coalescer
+
+
+def test_without_interval_publishes_at_once(clock):
+    coalescer = Coalescer(clock=clock)
+    assert coalescer.submit("t", "device", {"a": 1}) == {"a": 1}
+    assert coalescer.submit("t", "device", {"a": 2}) == {"a": 2}
+
+
+def test_merges_messages_within_interval(clock):
+    coalescer = Coalescer(interval=10, clock=clock)
+    assert coalescer.submit("t", "device", {"a": 1}) == {"a": 1}
+    clock.advance(2)
+    assert coalescer.submit("t", "device", {"a": 2, "b": 1}) is None
+    assert coalescer.submit("t", "device", {"a": 3}) is None
+    assert coalescer.getPending() == 1
+    clock.advance(7)
+    assert coalescer.flush() == []
+    clock.advance(1)
+    assert coalescer.flush() == [("t", {"a": 3, "b": 1})]
+    assert coalescer.coalesced == 2
+    # The flushed message starts a new interval
+    assert coalescer.submit("t", "device", {"a": 4}) is None
+
+
+def test_topic_intervals(clock):
+    coalescer = Coalescer(interval=10, topicIntervals={"power": 0}, clock=clock)
+    assert coalescer.submit("t1", "power", {"v": 1}) == {"v": 1}
+    assert coalescer.submit("t1", "power", {"v": 2}) == {"v": 2}
+    assert coalescer.submit("t2", "device", {"v": 1}) == {"v": 1}
+    assert coalescer.submit("t2", "device", {"v": 2}) is None
+
+
+def test_forced_flush(clock):
+    coalescer = Coalescer(interval=10, clock=clock)
+    coalescer.submit("t", "device", {"a": 1})
+    coalescer.submit("t", "device", {"a": 2})
+    assert coalescer.flush(force=True) == [("t", {"a": 2})]
+    assert coalescer.getPending() == 0
+
+
+def test_forgets_quiet_topics(clock):
+    coalescer = Coalescer(interval=10, clock=clock)
+    coalescer.submit("t", "device", {"a": 1})
+    clock.advance(10)
+    coalescer.flush()
+    assert coalescer.lastPublish == {}
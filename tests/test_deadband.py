@@ -0,0 +1,106 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+from types import SimpleNamespace
+
+import pytest
+
+from meshtastic2hass.deadband import Deadband, parseDeadband
+from meshtastic2hass.sensors import compileSensors
+
+SENSORS = [
+    dict(
+        id="voltage", name="Voltage", state_topic="device", property="voltage",
+        deadband=0.1,
+    ),
+    dict(
+        id="level", name="Level", state_topic="device", property="level",
+        deadband="10%",
+    ),
+]
+
+
+@pytest.fixture
+def deadband(clock):
+    sensors = compileSensors(SENSORS, defaults=())
+    return Deadband(sensors.byTopic, heartbeat=600, clock=clock)
+
+
+@pytest.fixture
+def node():
+    return SimpleNamespace(states=None)
+
+
+def test_parse_deadband():
+    assert parseDeadband(0.5) == (0.5, 0.0)
+    assert parseDeadband("2") == (2.0, 0.0)
+    assert parseDeadband(" 5% ") == (0.0, 0.05)
+    assert parseDeadband(None) == (0.0, 0.0)
+
+
+def test_suppresses_changes_within_deadband(deadband, node):
+    assert deadband.submit(node, "device", {"voltage": 4.0, "level": 50})
+    assert not deadband.submit(node, "device", {"voltage": 4.05, "level": 54})
+    assert deadband.submit(node, "device", {"voltage": 4.2, "level": 50})
+    # Relative to the last published value
+    assert deadband.submit(node, "device", {"voltage": 4.2, "level": 55})
+    assert deadband.suppressed == 1
+
+
+def test_heartbeat_publishes_unchanged_values(deadband, node, clock):
+    assert deadband.submit(node, "device", {"voltage": 4.0})
+    clock.advance(599)
+    assert not deadband.submit(node, "device", {"voltage": 4.0})
+    clock.advance(1)
+    assert deadband.submit(node, "device", {"voltage": 4.0})
+
+
+def test_first_value_of_a_sensor_is_published(deadband, node):
+    assert deadband.submit(node, "device", {"voltage": 4.0})
+    assert deadband.submit(node, "device", {"voltage": 4.0, "level": 50})
+
+
+def test_unknown_topics_and_zero_heartbeat_publish(clock, node):
+    sensors = compileSensors(SENSORS, defaults=())
+    assert Deadband(sensors.byTopic, heartbeat=600, clock=clock).submit(
+        node, "environment", {"temperature": 20}
+    )
+    deadband = Deadband(sensors.byTopic, heartbeat=0, clock=clock)
+    assert deadband.submit(node, "device", {"voltage": 4.0})
+    assert deadband.submit(node, "device", {"voltage": 4.0})
+
+
+def test_changed_string_value_is_published(clock, node):
+    sensors = compileSensors(
+        SENSORS
+        + [
+            dict(
+                id="mode", name="Mode", state_topic="device", property="mode",
+                type="string",
+            )
+        ],
+        defaults=(),
+    )
+    deadband = Deadband(sensors.byTopic, heartbeat=600, clock=clock)
+    assert deadband.submit(node, "device", {"voltage": 4.0, "mode": "idle"})
+    assert not deadband.submit(node, "device", {"voltage": 4.0, "mode": "idle"})
+    assert deadband.submit(node, "device", {"voltage": 4.0, "mode": "charging"})
+    assert not deadband.submit(node, "device", {"voltage": 4.0, "mode": "charging"})
+    # A sensor switching between numeric and non-numeric values
+    assert deadband.submit(node, "device", {"voltage": "n/a", "mode": "charging"})
+    assert deadband.submit(node, "device", {"voltage": 4.0, "mode": "charging"})
+    assert deadband.submit(node, "device", {"voltage": "n/a", "mode": "charging"})
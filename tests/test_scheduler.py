@@ -0,0 +1,132 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import pytest
+
+from meshtastic2hass.radio import RadioContext
+from meshtastic2hass.scheduler import DROP, KEEP, OutboundScheduler, airtime
+
+
+class FakeInterface:
+    """Interface reporting the device metrics of the local node."""
+
+    def __init__(self, channelUtilization=None, airUtilTx=None):
+        """Constructor for the FakeInterface class"""
+        self.deviceMetrics = {
+            "channelUtilization": channelUtilization,
+            "airUtilTx": airUtilTx,
+        }
+
+    def getMyNodeInfo(self):
+        return {"deviceMetrics": self.deviceMetrics}
+
+
+@pytest.fixture
+def radio():
+    radio = RadioContext("r0")
+    radio.interface = FakeInterface()
+    return radio
+
+
+def texts(messages):
+    return [message.getText() for message in messages]
+
+
+def test_airtime_grows_with_spreading_factor():
+    fast = airtime((7, 250, 5), 50)
+    slow = airtime((12, 125, 8), 50)
+    assert 0 < fast < slow
+    assert airtime((11, 250, 5), 10) < airtime((11, 250, 5), 100)
+
+
+def test_token_bucket_limits_rate(radio, clock):
+    cost = airtime(radio.loraParams, len("msg0") + 32)
+    scheduler = OutboundScheduler(
+        airtimeShare=0.1, burst=2 * cost, duplicates=KEEP, clock=clock
+    )
+    for i in range(4):
+        assert scheduler.submit(radio, 0, "LongFast", f"msg{i}")
+    # The full bucket allows a burst of two messages
+    assert texts(scheduler.poll()) == ["msg0", "msg1"]
+    assert scheduler.poll() == []
+    # Refilled with airtimeShare seconds per second
+    clock.advance(1.01 * cost / 0.1)
+    assert texts(scheduler.poll()) == ["msg2"]
+    clock.advance(cost / 0.1)
+    assert texts(scheduler.poll()) == ["msg3"]
+
+
+def test_channels_have_own_buckets(radio, clock):
+    cost = airtime(radio.loraParams, len("msg") + 32)
+    scheduler = OutboundScheduler(burst=cost, duplicates=KEEP, clock=clock)
+    scheduler.submit(radio, 0, "LongFast", "msg")
+    scheduler.submit(radio, 0, "LongFast", "msg")
+    scheduler.submit(radio, 1, "Other", "msg")
+    assert [message.channelIndex for message in scheduler.poll()] == [0, 1]
+    assert scheduler.getQueueDepth() == 1
+
+
+def test_rate_follows_channel_utilization(radio):
+    scheduler = OutboundScheduler(airtimeShare=0.1, maxChannelUtilization=20)
+    assert scheduler.getRate(radio) == pytest.approx(0.1)
+    radio.interface = FakeInterface(channelUtilization=10)
+    assert scheduler.getRate(radio) == pytest.approx(0.05)
+    radio.interface = FakeInterface(channelUtilization=30)
+    assert scheduler.getRate(radio) == 0.0
+    radio.interface = FakeInterface(airUtilTx=10)
+    assert scheduler.getRate(radio) == 0.0
+
+
+def test_priority_order_and_full_queue(radio, clock):
+    scheduler = OutboundScheduler(queueSize=2, burst=100, duplicates=KEEP, clock=clock)
+    assert scheduler.submit(radio, 0, "LongFast", "low", priority="low")
+    assert scheduler.submit(radio, 0, "LongFast", "normal")
+    # A higher priority message evicts the lowest priority one
+    assert scheduler.submit(radio, 0, "LongFast", "high", priority="high")
+    assert not scheduler.submit(radio, 0, "LongFast", "low2", priority="low")
+    assert scheduler.rejected == {"full": 2}
+    assert texts(scheduler.poll()) == ["high", "normal"]
+
+
+def test_expired_messages_are_rejected(radio, clock):
+    scheduler = OutboundScheduler(burst=0.001, maxAge=60, clock=clock)
+    scheduler.submit(radio, 0, "LongFast", "first")
+    scheduler.submit(radio, 0, "LongFast", "second")
+    # The first message runs the bucket into debt, the second one waits
+    assert texts(scheduler.poll()) == ["first"]
+    clock.advance(61)
+    assert scheduler.poll() == []
+    assert scheduler.rejected == {"expired": 1}
+
+
+def test_duplicates_are_merged(radio, clock):
+    scheduler = OutboundScheduler(burst=100, clock=clock)
+    assert scheduler.submit(radio, 0, "LongFast", "msg")
+    assert scheduler.submit(radio, 0, "LongFast", "msg")
+    assert texts(scheduler.poll()) == ["msg (x2)"]
+    # Sent within the duplicate window
+    assert not scheduler.submit(radio, 0, "LongFast", "msg")
+    clock.advance(60)
+    scheduler.poll()
+    assert scheduler.submit(radio, 0, "LongFast", "msg")
+
+
+def test_duplicates_are_dropped(radio, clock):
+    scheduler = OutboundScheduler(burst=100, duplicates=DROP, clock=clock)
+    assert scheduler.submit(radio, 0, "LongFast", "msg")
+    assert not scheduler.submit(radio, 0, "LongFast", "msg")
+    assert scheduler.rejected == {"duplicate": 1}
@@ -0,0 +1,77 @@
+# This file is part of Meshtastic to Home Assistant (Hass)
+#
+# Copyright (c) 2025 Michael Wolf <michael@mictronics.de>
+#
+# meshtastic2hass is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# meshtastic2hass is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with meshtastic2hass. If not, see http://www.gnu.org/licenses/.
+#
+import pytest
+
+from meshtastic2hass.spool import Spool
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "spool.db")
+
+
+def test_takes_messages_in_order(path, clock):
+    spool = Spool(path, clock=clock)
+    for i in range(5):
+        spool.put(f"t/{i}", f"{i}", qos=1)
+    assert len(spool) == 5
+    assert spool.take(2) == [("t/0", b"0", 1, False), ("t/1", b"1", 1, False)]
+    assert [message[0] for message in spool.take(10)] == ["t/2", "t/3", "t/4"]
+    assert len(spool) == 0
+    assert spool.take(10) == []
+    spool.close()
+
+
+def test_survives_restart(path, clock):
+    spool = Spool(path, clock=clock)
+    spool.put("t/0", b"x")
+    spool.close()
+    spool = Spool(path, clock=clock)
+    assert len(spool) == 1
+    assert spool.take(1) == [("t/0", b"x", 1, False)]
+    spool.close()
+
+
+def test_message_cap_evicts_oldest(path, clock):
+    spool = Spool(path, maxMessages=3, clock=clock)
+    for i in range(5):
+        spool.put(f"t/{i}", b"x")
+    assert len(spool) == 3
+    assert spool.evicted == 2
+    assert [message[0] for message in spool.take(10)] == ["t/2", "t/3", "t/4"]
+    spool.close()
+
+
+def test_byte_cap_evicts_oldest(path, clock):
+    spool = Spool(path, maxBytes=25, clock=clock)
+    for i in range(4):
+        spool.put(f"t/{i}", b"0123456789")
+    assert spool.bytes <= 25
+    assert [message[0] for message in spool.take(10)] == ["t/2", "t/3"]
+    spool.close()
+
+
+def test_expires_old_messages(path, clock):
+    spool = Spool(path, maxAge=60, clock=clock)
+    spool.put("t/old", b"x")
+    clock.advance(30)
+    spool.put("t/new", b"x")
+    clock.advance(31)
+    assert [message[0] for message in spool.take(10)] == ["t/new"]
+    assert spool.evicted == 1
+    spool.close()